@@ -0,0 +1,152 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+# ==============================================================================
+# == Debug artifact store ==
+# ==============================================================================
+# Keeps the raw bytes of pages worth a second look (no result blocks, blocked
+# by Google, unexpected errors) so selectors can be fixed offline and the
+# pages reused as bench_parse.py fixtures.
+#
+# Bodies are stored once per content hash: <dir>/<sha[:2]>/<sha>.html.gz. The
+# same page saved again (e.g. one CAPTCHA page for every query during a block)
+# costs a hash and an index line, not another file. Every save appends its
+# metadata (kind, target, query, page, status, headers, time) to
+# <dir>/index.jsonl. Like the response cache, file mtimes are the LRU clock.
+# The index counts towards the size cap too: once over it, the index is
+# compacted first (lines of gone bodies dropped, at most
+# INDEX_RECORDS_PER_BODY kept per body), then the oldest bodies are evicted.
+# The body just saved is never evicted, and a single body bigger than the
+# whole cap is not stored at all.
+
+ARTIFACT_FILE_SUFFIX = ".html.gz"
+INDEX_FILE = "index.jsonl"
+INDEX_RECORDS_PER_BODY = 20 # Latest saves of one body kept in the index when it is compacted
+
+
+class ArtifactStore:
+    """Content-addressed, gzip-compressed, size-capped store of raw pages."""
+
+    def __init__(self, store_dir, max_bytes=None):
+        self.store_dir = store_dir
+        self.max_bytes = max_bytes # None = unbounded
+        self.index_path = os.path.join(store_dir, INDEX_FILE)
+        self._lock = threading.Lock()
+        os.makedirs(store_dir, exist_ok=True)
+        index_bytes = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        self._total_bytes = index_bytes + sum(size for _, _, size in self._entries())
+
+    def path_for(self, digest):
+        return os.path.join(self.store_dir, digest[:2], digest + ARTIFACT_FILE_SUFFIX)
+
+    def _entries(self):
+        """Yield (mtime, path, size) for every stored body."""
+        for sub in os.scandir(self.store_dir):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(ARTIFACT_FILE_SUFFIX):
+                    st = entry.stat()
+                    yield st.st_mtime, entry.path, st.st_size
+
+    def save(self, kind, content, **meta):
+        """Store raw `content` bytes with their metadata; return the body's path.
+
+        `meta` is free-form (target, query, page, status, url, headers, ...).
+        Returns None if the compressed body alone is over max_bytes.
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        path = self.path_for(digest)
+        record = {"sha256": digest, "kind": kind, "saved_at": time.time(), "bytes": len(content), **meta}
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            if os.path.exists(path):
+                os.utime(path) # Seen again, keep it longest
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+                    f.write(content)
+                size = os.path.getsize(tmp_path)
+                if self.max_bytes is not None and size > self.max_bytes:
+                    os.remove(tmp_path)
+                    logging.warning(f"Not saving {kind} page of {len(content)} bytes, "
+                                    f"{size} compressed is over the {self.max_bytes} byte artifact cap")
+                    return None
+                os.replace(tmp_path, path) # Atomic, a crash never leaves a half-written body
+                self._total_bytes += size
+            with open(self.index_path, "ab") as f:
+                f.write(line)
+            self._total_bytes += len(line)
+            if self.max_bytes is not None and self._total_bytes > self.max_bytes:
+                self._compact_index()
+                if self._total_bytes > self.max_bytes:
+                    self._evict(keep=path)
+        return path
+
+    def load(self, digest):
+        """Raw bytes of a stored body."""
+        with gzip.open(self.path_for(digest), "rb") as f:
+            return f.read()
+
+    def records(self):
+        """Index records whose body is still stored, oldest first."""
+        with self._lock:
+            return [r for r in self._read_index() if os.path.exists(self.path_for(r["sha256"]))]
+
+    def _read_index(self):
+        if not os.path.exists(self.index_path):
+            return []
+        records = []
+        with open(self.index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    continue # Torn last line after a crash
+        return records
+
+    def _compact_index(self):
+        """Rewrite the index with only the latest INDEX_RECORDS_PER_BODY lines of each stored body (lock held)."""
+        records = self._read_index()
+        per_body = {}
+        kept = []
+        for r in reversed(records): # Newest first
+            digest = r["sha256"]
+            if per_body.get(digest, 0) >= INDEX_RECORDS_PER_BODY or not os.path.exists(self.path_for(digest)):
+                continue
+            per_body[digest] = per_body.get(digest, 0) + 1
+            kept.append(r)
+        kept.reverse()
+        old_size = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in kept)
+        os.replace(tmp_path, self.index_path)
+        self._total_bytes += os.path.getsize(self.index_path) - old_size
+        if len(kept) < len(records):
+            logging.info(f"Compacted artifact index from {len(records)} to {len(kept)} records")
+
+    def _evict(self, keep=None):
+        """Drop least recently used bodies, except `keep`, until under max_bytes (lock held)."""
+        evicted = 0
+        for _, path, size in sorted(self._entries()):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._total_bytes -= size
+            evicted += 1
+        if not evicted:
+            return
+        self._compact_index() # Drop the evicted bodies' lines so the index stays bounded too
+        logging.info(f"Artifact store over {self.max_bytes} bytes, evicted {evicted} pages")
@@ -0,0 +1,152 @@
+import argparse
+import glob
+import gzip
+import json
+import os
+import statistics
+import time
+import tracemalloc
+
+from serp_parser import DEFAULT_BACKEND, PARSER_BACKENDS, extract_results
+from username_matcher import UsernameMatcher
+
+# ==============================================================================
+# == Offline parse benchmark ==
+# ==============================================================================
+# Runs extract_results() over saved result pages (no network) and reports
+# throughput, per-page latency percentiles and peak memory. Use it to get a
+# baseline before touching selectors / the parser, then compare against it.
+#
+#   python bench_parse.py                        # default corpus, print report
+#   python bench_parse.py "fixtures/*.html"      # committed pages only, same on any checkout
+#   python bench_parse.py --json baseline.json   # save a baseline
+#   python bench_parse.py --baseline baseline.json   # compare with a saved one
+
+DEFAULT_PATTERNS = [
+    "fixtures/*.html", # Synthetic pages (mock_search_server.py --write-fixtures)
+    "debug_artifacts/*/*.html.gz", # Saved by main.py (see artifact_store.py)
+    "debug_page_*.html",
+    "error_page_*.html",
+    "blocked_page_*.html",
+]
+DEFAULT_USERNAMES = ["leanbeefpatty"]
+
+
+def load_corpus(patterns):
+    """Read every page matching the glob patterns into memory (path, html)."""
+    paths = sorted({p for pattern in patterns for p in glob.glob(pattern)})
+    corpus = []
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+            corpus.append((path, f.read()))
+    return corpus
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def run_benchmark(corpus, usernames, iterations=5, warmup=1, backend=None):
+    """Time extract_results over the corpus and return a report dict."""
+    matcher = UsernameMatcher(usernames) # Built once, like a real run
+    for _ in range(warmup):
+        for _, html in corpus:
+            extract_results(html, matcher, backend)
+
+    latencies = []
+    blocks = hits = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for _, html in corpus:
+            t0 = time.perf_counter()
+            block_count, results = extract_results(html, matcher, backend)
+            latencies.append(time.perf_counter() - t0)
+            blocks += block_count
+            hits += len(results)
+    elapsed = time.perf_counter() - started
+
+    # Separate pass for memory: tracemalloc slows allocation down a lot,
+    # so it must not be active while timing. It only sees the Python heap,
+    # not libxml2's C allocations behind the lxml backend.
+    tracemalloc.start()
+    peak = 0
+    for _, html in corpus:
+        tracemalloc.reset_peak()
+        extract_results(html, matcher, backend)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+
+    latencies.sort()
+    pages = len(latencies)
+    return {
+        "backend": backend or DEFAULT_BACKEND,
+        "pages": len(corpus),
+        "iterations": iterations,
+        "corpus_bytes": sum(len(html.encode("utf-8")) for _, html in corpus),
+        "pages_per_sec": pages / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "mean": statistics.fmean(latencies) * 1000,
+            "p50": percentile(latencies, 50) * 1000,
+            "p90": percentile(latencies, 90) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "max": latencies[-1] * 1000,
+        },
+        "peak_memory_kb": peak / 1024,
+        "blocks_per_pass": blocks // iterations,
+        "hits_per_pass": hits // iterations,
+    }
+
+
+def print_report(report, baseline=None):
+    """Pretty-print a report, with % change against a baseline if given."""
+    def delta(value, key, sub=None):
+        if not baseline:
+            return ""
+        old = baseline[key][sub] if sub else baseline[key]
+        if not old:
+            return ""
+        return f"  ({(value - old) / old * 100:+.1f}% vs baseline)"
+
+    lat = report["latency_ms"]
+    print(f"Backend: {report['backend']}")
+    print(f"Pages: {report['pages']} x {report['iterations']} iterations ({report['corpus_bytes'] / 1024:.0f} KB corpus)")
+    print(f"Throughput: {report['pages_per_sec']:.1f} pages/sec{delta(report['pages_per_sec'], 'pages_per_sec')}")
+    for key in ("mean", "p50", "p90", "p99", "max"):
+        print(f"Latency {key:>4}: {lat[key]:8.2f} ms{delta(lat[key], 'latency_ms', key)}")
+    print(f"Peak Python memory (single page): {report['peak_memory_kb']:.0f} KB{delta(report['peak_memory_kb'], 'peak_memory_kb')}")
+    print(f"Blocks/pass: {report['blocks_per_pass']}  Hits/pass: {report['hits_per_pass']}")
+    if baseline and (baseline["blocks_per_pass"], baseline["hits_per_pass"]) != (report["blocks_per_pass"], report["hits_per_pass"]):
+        print("WARN: Block/hit counts differ from baseline - parser output changed, not just its speed.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark result-page parsing on saved HTML pages.")
+    parser.add_argument("patterns", nargs="*", default=DEFAULT_PATTERNS, help="Glob patterns of saved pages")
+    parser.add_argument("--username", nargs="+", default=DEFAULT_USERNAMES, help="Watched username(s) for the relevance check")
+    parser.add_argument("--backend", choices=sorted(PARSER_BACKENDS), default=DEFAULT_BACKEND, help="Parser backend to benchmark")
+    parser.add_argument("--iterations", type=int, default=5, help="Timed passes over the corpus")
+    parser.add_argument("--json", metavar="PATH", help="Write the report as JSON (e.g. to keep as a baseline)")
+    parser.add_argument("--baseline", metavar="PATH", help="Compare against a report saved with --json")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.patterns)
+    if not corpus:
+        print(f"No pages found for: {' '.join(args.patterns)}")
+        raise SystemExit(1)
+
+    report = run_benchmark(corpus, args.username, iterations=args.iterations, backend=args.backend)
+    baseline = None
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved report to: {args.json}")
@@ -0,0 +1,131 @@
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import main
+from metrics import Metrics
+from mock_search_server import add_behavior_arguments, behavior_from_args, start_mock_server
+from rate_scheduler import HostRateScheduler
+from username_matcher import UsernameMatcher
+
+# ==============================================================================
+# == Offline load test ==
+# ==============================================================================
+# Full multi-target, multi-query runs of main.py's fetch path against the local
+# mock server (mock_search_server.py): real sessions with setup_session()'s
+# Retry/HTTPAdapter, the shared HostRateScheduler, streaming + parsing and
+# result sinks. Only the cache, checkpoint and seen index are left out so
+# every run does the same work. Reports end-to-end pages/sec, retries and tail
+# latency from the run's Metrics.
+#
+#   python load_test.py --targets 20 --workers 8 --pages 3
+#   python load_test.py --latency lognormal:-2.5,0.8 --rate-429 0.05 --chunk-bytes 4096 --chunk-delay 0.005
+#   python load_test.py --json after.json --baseline before.json
+
+REPORT_STAGES = ["request", "connect", "ttfb", "download", "feed", "parse", "extract", "wait"]
+
+
+def run_load(targets, workers, pages, interval, behavior):
+    """Run every target against a fresh mock server; return (report, metrics)."""
+    server, url = start_mock_server(behavior)
+    saved = main.GOOGLE_SEARCH_URL, main.PAGES_PER_QUERY
+    main.GOOGLE_SEARCH_URL, main.PAGES_PER_QUERY = url, pages
+    metrics = Metrics()
+    ctx = main.RunContext(scheduler=HostRateScheduler(*interval), matcher=UsernameMatcher(targets), metrics=metrics)
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+            os.chdir(tmp) # Result files land here and vanish with it
+            try:
+                ctx.open_results(targets)
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="target") as executor:
+                    futures = [executor.submit(main.run_target, username, main.setup_session(), ctx) for username in targets]
+                    failed = sum(1 for future in futures if future.exception() is not None)
+                elapsed = time.perf_counter() - started
+                ctx.close_results()
+            finally:
+                os.chdir(cwd)
+    finally:
+        main.GOOGLE_SEARCH_URL, main.PAGES_PER_QUERY = saved
+        server.shutdown()
+
+    summary = metrics.summary()
+    counters = summary["counters"]
+    pages_done = counters.get("pages_parsed", 0)
+    report = {
+        "targets": len(targets),
+        "workers": workers,
+        "pages_per_query": pages,
+        "elapsed_s": round(elapsed, 3),
+        "pages_per_sec": round(pages_done / elapsed, 2) if elapsed else 0.0,
+        "pages_parsed": pages_done,
+        "retries": counters.get("retries", 0),
+        "request_errors": counters.get("request_errors", 0),
+        "incomplete_pages": ctx.incomplete_pages,
+        "failed_targets": failed,
+        "hits": counters.get("hits", 0),
+        "server": dict(behavior.stats),
+        "stages": {stage: summary["stages"][stage] for stage in REPORT_STAGES if stage in summary["stages"]},
+    }
+    return report, metrics
+
+
+def print_report(report, baseline=None):
+    print(f"Targets: {report['targets']} x {len(main.SEARCH_QUERY_TEMPLATES)} queries x {report['pages_per_query']} pages, "
+          f"{report['workers']} workers")
+    print(f"Elapsed: {report['elapsed_s']:.2f} s")
+    print(f"Throughput: {report['pages_per_sec']:.1f} pages/sec ({report['pages_parsed']} pages parsed)")
+    print(f"Retries: {report['retries']}  Request errors: {report['request_errors']}  "
+          f"Incomplete pages: {report['incomplete_pages']}  Failed targets: {report['failed_targets']}")
+    print(f"Server: {report['server']}")
+    for stage, s in report["stages"].items():
+        print(f"  {stage:<9} p50={s['p50_s'] * 1000:8.2f}ms  p95={s['p95_s'] * 1000:8.2f}ms  "
+              f"p99={s['p99_s'] * 1000:8.2f}ms  max={s['max_s'] * 1000:8.2f}ms")
+    if baseline:
+        change = (report["pages_per_sec"] / baseline["pages_per_sec"] - 1) * 100 if baseline["pages_per_sec"] else 0.0
+        print(f"vs baseline: {baseline['pages_per_sec']:.1f} pages/sec ({change:+.1f}%)")
+        for stage in ("request", "ttfb"):
+            if stage in report["stages"] and stage in baseline.get("stages", {}):
+                print(f"  {stage} p99: {baseline['stages'][stage]['p99_s'] * 1000:.2f}ms -> "
+                      f"{report['stages'][stage]['p99_s'] * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Load-test the fetch/parse pipeline against the local mock server.")
+    arg_parser.add_argument("--targets", type=int, default=8, help="Number of synthetic target usernames")
+    arg_parser.add_argument("--workers", type=int, default=main.BATCH_WORKERS, help="Targets processed in parallel")
+    arg_parser.add_argument("--pages", type=int, default=2, help="PAGES_PER_QUERY for the run")
+    arg_parser.add_argument("--interval", type=float, nargs=2, default=[0.0, 0.0], metavar=("MIN", "MAX"),
+                            help="Scheduler spacing between requests (seconds, default: none)")
+    arg_parser.add_argument("--json", metavar="PATH", help="Save the report as JSON")
+    arg_parser.add_argument("--baseline", metavar="PATH", help="Compare against a saved JSON report")
+    arg_parser.add_argument("--metrics-prom", metavar="PATH", help="Also write the run metrics in Prometheus text format")
+    add_behavior_arguments(arg_parser)
+    args = arg_parser.parse_args()
+    try:
+        behavior = behavior_from_args(args)
+    except ValueError as e:
+        arg_parser.error(str(e))
+
+    logging.basicConfig(level=logging.ERROR) # main.py logs every page at INFO
+    targets = [f"load_user{i}" for i in range(args.targets)]
+    report, metrics = run_load(targets, max(1, args.workers), args.pages, args.interval, behavior)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved report to {args.json}")
+    if args.metrics_prom:
+        metrics.write_prometheus(args.metrics_prom)
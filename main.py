@@ -1,20 +1,47 @@
 import requests
-from bs4 import BeautifulSoup
 import time
 import random
 import urllib.parse
 import json
 import logging
 import os
-import re # <--- Added for filename sanitizing
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 from urllib3.util.retry import Retry
 
+from artifact_store import ArtifactStore
+from metrics import Metrics
+from post_store import PostStore
+from query_planner import QueryPlanner, QueryProgress, YieldStats
+from rate_scheduler import HostRateScheduler
+from response_cache import ResponseCache
+from result_sink import Checkpoint, JsonlSink, iter_jsonl
+from seen_index import SeenIndex
+from username_matcher import UsernameMatcher
+from serp_parser import PageReader
+
 # ==============================================================================
 # == CONFIGURATION - MODIFY THIS SECTION ==
 # ==============================================================================
 TARGET_USERNAME = "leanbeefpatty"  # <<<--- SET THE TARGET USERNAME HERE
-OUTPUT_FILE = f"{TARGET_USERNAME}_instagram_results.json"  # Output file for results
+OUTPUT_FILE_TEMPLATE = "{username}_instagram_results.json"  # One output file per target
+OUTPUT_FILE = OUTPUT_FILE_TEMPLATE.format(username=TARGET_USERNAME)  # Output file for results
+# Hits are streamed here while the run is going; OUTPUT_FILE is written from it at the end,
+# and only then is it emptied (hits of an interrupted run are carried into the next one)
+RESULTS_JSONL_TEMPLATE = "{username}_instagram_results.jsonl"
+# Finished (target, query, page) units; an interrupted run resumes from here (--fresh to start over)
+CHECKPOINT_FILE = "scraper_checkpoint.jsonl"
+# A checkpoint not written for this long is from an earlier run, not one to resume
+# (a scheduled run would otherwise skip pages the last run finished)
+CHECKPOINT_MAX_AGE_SECONDS = 12 * 3600
+# Every link ever reported per target. Runs only report links not in here (--no-seen-index to disable)
+SEEN_INDEX_FILE = "seen_links.sqlite3"
+# Per-stage timings and counters of the run (see metrics.py), written at the end
+METRICS_SUMMARY_FILE = "run_metrics.json"
 LOG_FILE = "scraper.log"  # Log file for debugging
 USE_PROXIES = False  # Set to True if you have a proxy pool
 PROXY_POOL = [
@@ -23,14 +50,23 @@ PROXY_POOL = [
 
 # ==============================================================================
 # --- Search Query Configuration ---
-SEARCH_QUERIES = [
-    f'"{TARGET_USERNAME}" site:instagram.com',
-    f'from:{TARGET_USERNAME} site:instagram.com', # Note: 'from:' might not work well with Google search
-    f'"{TARGET_USERNAME}" commented on site:instagram.com',
+# {username} is replaced with each target's username
+SEARCH_QUERY_TEMPLATES = [
+    '"{username}" site:instagram.com',
+    'from:{username} site:instagram.com', # Note: 'from:' might not work well with Google search
+    '"{username}" commented on site:instagram.com',
 ]
 
-# Number of Google Search result pages to fetch per query
+# Number of Google Search result pages to fetch per query, on average: each
+# target gets PAGES_PER_QUERY * len(SEARCH_QUERY_TEMPLATES) pages, spent on the
+# templates with the best yield so far (see query_planner.py)
 PAGES_PER_QUERY = 1  # <<<--- Start with 1 page during debugging
+MAX_PAGES_PER_QUERY = 10  # No single template gets more pages than this
+RESULTS_PER_PAGE = 10  # Requested per page (num=); fewer result blocks means it was the last page
+# New posts per page of every (target, template), kept across runs for the planner
+YIELD_STATS_FILE = "query_yield.sqlite3"
+# Stop paging a query after this many consecutive live pages without new posts
+SEEN_CUTOFF_PAGES = 1
 
 # Time delays (in seconds)
 DELAY_BETWEEN_PAGES_MIN = 10 # Be generous during testing
@@ -38,8 +74,32 @@ DELAY_BETWEEN_PAGES_MAX = 25
 DELAY_BETWEEN_QUERIES_MIN = 25
 DELAY_BETWEEN_QUERIES_MAX = 50
 
+# --- Batch Mode (--targets / --targets-file) ---
+# Targets run in parallel worker threads that share one per-host request
+# budget: consecutive requests to Google are spaced by
+# uniform(DELAY_BETWEEN_PAGES_MIN, DELAY_BETWEEN_PAGES_MAX) seconds in total,
+# not per target. Workers parse and save while others wait for their slot.
+BATCH_WORKERS = 4
+
 # --- Technical Configuration ---
 GOOGLE_SEARCH_URL = "https://www.google.com/search"
+PARSER_BACKEND = None  # "lxml" or "html.parser"; None = lxml if installed, else html.parser
+STREAM_CHUNK_BYTES = 16 * 1024  # Body chunks are scanned and parsed as they arrive
+
+# --- Response Cache ---
+# Fetched pages are cached on disk so re-runs (e.g. after a selector fix) don't
+# hit Google again. Live runs only write it: run with --replay to parse from
+# cache only, --use-cache to also serve fresh cached pages in a live run,
+# --no-cache to bypass. A monitoring run must see today's page 1, not last week's.
+CACHE_DIR = ".response_cache"
+CACHE_TTL_SECONDS = 7 * 24 * 3600  # With --use-cache, cached pages older than this are re-fetched (ignored in --replay)
+CACHE_MAX_BYTES = 500 * 1024 * 1024  # Least recently used pages are evicted above this size
+
+# --- Debug Artifacts ---
+# Raw pages with no result blocks, blocked pages and pages that raised are kept
+# here (gzipped, one copy per distinct body, metadata in index.jsonl).
+ARTIFACT_DIR = "debug_artifacts"
+ARTIFACT_MAX_BYTES = 50 * 1024 * 1024  # Bodies + index; least recently seen pages are evicted above this size
 
 # Headers to mimic a browser
 USER_AGENTS = [
@@ -63,45 +123,298 @@ DEFAULT_HEADERS = {
 }
 
 # --- Logging Setup ---
-logging.basicConfig(
-    filename=LOG_FILE,
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    filemode='w' # Overwrite log each run
-)
-# Also log to console
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.WARNING) # Show warnings and errors on console
-formatter = logging.Formatter('%(levelname)s - %(message)s')
-console_handler.setFormatter(formatter)
-logging.getLogger().addHandler(console_handler)
+def setup_logging():
+    """Log to LOG_FILE, warnings and errors also to the console.
+
+    Called from __main__ only, so importing this module (e.g. from a harness)
+    doesn't overwrite the log file.
+    """
+    logging.basicConfig(
+        filename=LOG_FILE,
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        filemode='w' # Overwrite log each run
+    )
+    # Also log to console
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.WARNING) # Show warnings and errors on console
+    formatter = logging.Formatter('%(levelname)s - %(message)s')
+    console_handler.setFormatter(formatter)
+    logging.getLogger().addHandler(console_handler)
 
 
 # --- Functions ---
 
+# --- Connect timing ---
+# Time spent opening new connections (TCP + TLS) by the current thread, so the
+# "connect" stage can be told apart from the server's time to first byte.
+# Connections reused from the pool add nothing. Proxied connections aren't timed.
+_connect_time = threading.local()
+
+def _timed_connection(connection_cls):
+    class TimedConnection(connection_cls):
+        def connect(self):
+            started = time.perf_counter()
+            try:
+                super().connect()
+            finally:
+                _connect_time.seconds = getattr(_connect_time, 'seconds', 0.0) + time.perf_counter() - started
+    return TimedConnection
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _timed_connection(HTTPConnection)
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _timed_connection(HTTPSConnection)
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose connection pools record connect time (see take_connect_time)."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _TimedHTTPConnectionPool, "https": _TimedHTTPSConnectionPool}
+
+def take_connect_time():
+    """Connect seconds this thread spent since the last call (0.0 if every connection was reused)."""
+    seconds = getattr(_connect_time, 'seconds', 0.0)
+    _connect_time.seconds = 0.0
+    return seconds
+
 def setup_session():
     """Create a requests session with retries."""
     session = requests.Session()
     # Retry on 429 (Too Many Requests) and server errors
     retries = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
-    adapter = HTTPAdapter(max_retries=retries)
+    adapter = TimedHTTPAdapter(max_retries=retries)
     session.mount('http://', adapter)
     session.mount('https://', adapter)
     return session
 
-def fetch_search_results(query, pages=1, session=None):
-    """Fetches Google search results for a given query."""
-    found_results = [] # Store dicts {title, link, snippet}
+class RunContext:
+    """Run-wide services shared by every query and target. All are optional.
+
+    cache: ResponseCache every successful fetch is stored in. Pages are
+        served from it only with replay=True (cached pages only, any age)
+        or read_cache=True (fresh cached pages, the rest fetched).
+    scheduler: HostRateScheduler live requests wait on instead of sleeping
+        between pages (batch mode).
+    checkpoint: Checkpoint of finished pages, which are skipped on resume.
+    seen_index: SeenIndex of posts saved by earlier runs. Known posts are
+        not reported again, so pages of only known posts count as pages
+        without new posts (SEEN_CUTOFF_PAGES). This run's posts are added
+        by report_target() once they are saved.
+    matcher: UsernameMatcher over every target of the run. Each hit is
+        attributed to all targets it mentions, not just the query's target.
+    target_results: username -> TargetResults hits are streamed to, filled
+        by open_results(). Without an entry hits are only returned.
+    metrics: Metrics the pipeline stages and counters are recorded in.
+    artifacts: ArtifactStore unparseable, blocked and failed pages are saved
+        to. Without one they are only logged.
+    yield_stats: YieldStats the page planner learns from and records to.
+        Without one it only uses what the current run found.
+    """
+
+    def __init__(self, cache=None, replay=False, scheduler=None, checkpoint=None, seen_index=None, matcher=None,
+                 metrics=None, artifacts=None, yield_stats=None, read_cache=False):
+        self.cache = cache
+        self.replay = replay
+        self.read_cache = read_cache
+        self.scheduler = scheduler
+        self.checkpoint = checkpoint
+        self.seen_index = seen_index
+        self.matcher = matcher
+        self.metrics = metrics or Metrics()
+        self.artifacts = artifacts
+        self.yield_stats = yield_stats
+        self.target_results = {}
+        self.stop_event = threading.Event() # Set on Ctrl-C, workers stop after the current page
+        self.incomplete_pages = 0 # Pages skipped or failed, i.e. the campaign isn't finished
+        self._lock = threading.Lock()
+
+    def note_incomplete(self):
+        with self._lock:
+            self.incomplete_pages += 1
+
+    def open_results(self, usernames):
+        """Set up a TargetResults per username, resuming those the checkpoint has progress for."""
+        for username in usernames:
+            resuming = self.checkpoint is not None and self.checkpoint.has_progress(username)
+            self.target_results[username] = TargetResults(username, resuming)
+
+    def close_results(self):
+        for target_results in self.target_results.values():
+            target_results.close()
+
+class TargetResults:
+    """One target's posts (a PostStore) plus the RESULTS_JSONL_TEMPLATE sink of its sightings.
+
+    The sink is an append-only log of every sighting that added something
+    (a new post, or another query/snippet/URL for a known one) and is not
+    yet in the JSON output. Replaying it rebuilds the store, so a crash loses
+    nothing: on resume, and also when an interrupted run is not resumed
+    (--fresh, stale checkpoint), whose hits are carried over into this
+    run's output. saved() empties it once the output is written. The store itself
+    is in memory: one compact PostRecord per unique post of this run, which
+    report_target() saves from. Memory grows with the number of new posts
+    (not with sightings or pages); posts known from earlier runs are merged
+    into the seen index instead (see SeenIndex.record).
+    """
+
+    def __init__(self, username, resuming=False):
+        self.username = username
+        self.path = RESULTS_JSONL_TEMPLATE.format(username=username)
+        self.posts = PostStore()
+        for sighting in iter_jsonl(self.path):
+            self.posts.add(sighting, sighting.get('query'))
+        self.sink = JsonlSink(self.path)
+        if resuming:
+            print(f"--- Resuming '{username}': {len(self.posts)} results from the previous run ---")
+        elif len(self.posts):
+            logging.warning(f"Carrying over {len(self.posts)} unsaved results for '{username}' from {self.path}")
+            print(f"--- '{username}': carrying over {len(self.posts)} results an interrupted run never saved ---")
+
+    @property
+    def count(self):
+        return len(self.posts)
+
+    def __contains__(self, key):
+        return key in self.posts
+
+    def add(self, result, query):
+        """Merge a hit into its post and log the sighting; return True if the post is new."""
+        is_new, changed = self.posts.add(result, query)
+        if changed:
+            self.sink.write({**result, 'query': query})
+        return is_new
+
+    def saved(self):
+        """The posts are in the JSON output, the next run starts with an empty sink."""
+        self.sink.clear()
+
+    def close(self):
+        self.sink.close()
+
+def attribute_hits(target, results, query, ctx):
+    """Stream hits found by another target's query to `target` (see RunContext.matcher)."""
+    target_results = ctx.target_results.get(target)
+    if target_results is None:
+        return []
+    keys = [r['key'] for r in results]
+    known = ctx.seen_index.known(target, keys) if ctx.seen_index is not None else set()
+    # Known from an earlier run: only merged into the seen index. Already found in this run: merge the sighting in
+    added = [r for r in results if (r['key'] not in known or r['key'] in target_results) and target_results.add(r, query)]
+    for result in added:
+        logging.info(f"Attributed hit to '{target}' via query '{query}': {result['link']}")
+    if known:
+        ctx.seen_index.merge_sightings(target, [r for r in results if r['key'] in known], query)
+    return added
+
+def retry_count(response):
+    """Retries urllib3's Retry (see setup_session) needed for this response."""
+    retries = getattr(response.raw, 'retries', None)
+    return len(retries.history) if retries is not None else 0
+
+def declared_encoding(response):
+    """Charset of the Content-Type header, None if the server didn't send one."""
+    if getattr(response, 'from_cache', False):
+        return response.encoding # As declared when it was fetched
+    content_type = response.headers.get('content-type', '')
+    # requests falls back to ISO-8859-1 for text/* without a charset; let the parser detect it instead
+    return response.encoding if 'charset=' in content_type.lower() else None
+
+def read_body(response, reader, metrics):
+    """Feed the body of `response` to a PageReader, chunk by chunk as it downloads.
+
+    Returns the seconds spent in reader.feed() (block scan, charset decoding
+    and lxml's incremental parse), which --profile-parse profiles too.
+    """
+    chunks = [response.content] if getattr(response, 'from_cache', False) else \
+        response.iter_content(chunk_size=STREAM_CHUNK_BYTES)
+    fed = 0.0
+    for chunk in chunks:
+        started = time.perf_counter()
+        with metrics.profile_parse():
+            reader.feed(chunk)
+        fed += time.perf_counter() - started
+    return fed
+
+def save_artifact(ctx, kind, response, reader, username, query, page):
+    """Keep the raw page read by `reader` in ctx.artifacts; return its path or None."""
+    if ctx.artifacts is None or response is None or reader is None:
+        return None
+    try:
+        path = ctx.artifacts.save(
+            kind,
+            reader.content,
+            target=username,
+            query=query,
+            page=page + 1,
+            url=response.url,
+            status=response.status_code,
+            encoding=reader.encoding,
+            headers=dict(getattr(response, 'headers', None) or {}), # Cached responses have none
+        )
+    except Exception as e_write:
+        logging.error(f"Could not save {kind} page for query '{query}', page {page + 1}: {e_write}")
+        print(f"ERROR: Could not save {kind} page: {e_write}")
+        return None
+    if path is None: # Too big for the store, already logged
+        return None
+    ctx.metrics.inc('artifacts_saved')
+    logging.info(f"Saved {kind} page to: {path}")
+    print(f"Saved {kind} page to: {path}")
+    return path
+
+def fetch_search_results(query, pages=1, session=None, username=None, ctx=None, first_page=0, progress=None):
+    """Fetches Google search results for a given query.
+
+    Returns the results mentioning `username` (TARGET_USERNAME by default).
+    New hits are streamed to the target's TargetResults as soon as their page
+    is parsed, and hits mentioning other targets of the run are attributed
+    to them too. See RunContext for `ctx`.
+    Fetches `pages` pages starting at page index `first_page`, and stops
+    early after the last page of results or SEEN_CUTOFF_PAGES live pages
+    without new posts. A query_planner.QueryProgress passed as `progress`
+    is told about every page (including those skipped on resume, from the
+    checkpoint) and why paging stopped.
+    """
+    username = username or TARGET_USERNAME
+    ctx = ctx or RunContext()
+    cache, replay, scheduler, checkpoint, seen_index = ctx.cache, ctx.replay, ctx.scheduler, ctx.checkpoint, ctx.seen_index
+    metrics = ctx.metrics
+    matcher = ctx.matcher if ctx.matcher is not None and username in ctx.matcher.usernames else UsernameMatcher([username])
+    target_results = ctx.target_results.get(username)
+    sink = target_results.sink if target_results is not None else None
+    found_results = [] # Store dicts {title, link, snippet, targets, key}
     session = session or setup_session()
-    added_links = set() # Keep track of links added to avoid duplicates
+    added_keys = set() # Posts (shortcodes) already found by this query
+    if progress is None:
+        progress = QueryProgress(username, query, empty_page_limit=SEEN_CUTOFF_PAGES)
+
+    last_page = first_page + pages - 1
+    # The planner asks for one page at a time, so show where it is against the template's cap
+    page_of = f"of at most {progress.max_pages}" if progress.max_pages else f"of {last_page + 1}"
+    for page in range(first_page, last_page + 1):
+        response = reader = None
+        if ctx.stop_event.is_set():
+            ctx.note_incomplete()
+            break
+        progress.next_page = page + 1
+        if checkpoint is not None and checkpoint.is_done(username, query, page):
+            logging.info(f"Skipping '{query}' - Page {page + 1} {page_of}, finished in a previous run")
+            print(f"Skipping: '{query}' - Page {page + 1} {page_of} (already done)")
+            # Counts against the budget and stops paging as it did in the interrupted run
+            progress.resume_page(checkpoint.outcome(username, query, page), RESULTS_PER_PAGE)
+            if progress.closed:
+                break
+            continue
 
-    for page in range(pages):
-        start_index = page * 10
+        start_index = page * RESULTS_PER_PAGE
         params = {
             'q': query,
             'start': start_index,
             'hl': 'en', # Force English results
-            'num': 10, # Explicitly request 10 results
+            'num': RESULTS_PER_PAGE, # Explicitly request 10 results
             'filter': 0 # Try disabling duplicate filtering by Google
         }
         headers = {
@@ -110,214 +423,462 @@ def fetch_search_results(query, pages=1, session=None):
         }
         proxies = random.choice(PROXY_POOL) if USE_PROXIES and PROXY_POOL else None
 
-        logging.info(f"Searching: '{query}' - Page {page + 1}/{pages}")
-        print(f"Searching: '{query}' - Page {page + 1}/{pages}")
+        logging.info(f"Searching: '{query}' - Page {page + 1} {page_of}")
+        print(f"Searching: '{query}' - Page {page + 1} {page_of}")
 
         try:
-            response = session.get(
-                GOOGLE_SEARCH_URL,
-                params=params,
-                headers=headers,
-                proxies=proxies,
-                timeout=25 # Increased timeout slightly
-            )
+            response = None
+            if cache and (replay or ctx.read_cache):
+                with metrics.timer('cache_read'):
+                    response = cache.get(GOOGLE_SEARCH_URL, params, ignore_ttl=replay)
+            if response is not None:
+                logging.info(f"Served from cache (fetched {time.ctime(response.fetched_at)})")
+                metrics.inc('pages_from_cache')
+            elif replay:
+                logging.warning(f"Replay: no cached page for query '{query}', page {page + 1}. Skipping.")
+                print("WARN: Replay mode and this page is not cached. Skipping.")
+                ctx.note_incomplete()
+                progress.close("not cached")
+                continue
+            else:
+                if scheduler:
+                    with metrics.timer('wait'):
+                        waited = scheduler.wait(GOOGLE_SEARCH_URL, ctx.stop_event)
+                    logging.info(f"Waited {waited:.2f} seconds for a request slot")
+                    if ctx.stop_event.is_set():
+                        ctx.note_incomplete()
+                        progress.next_page = page # Not fetched after all
+                        break
+                progress.request_sent()
+                take_connect_time() # Start from zero for this request
+                request_started = time.perf_counter()
+                response = session.get(
+                    GOOGLE_SEARCH_URL,
+                    params=params,
+                    headers=headers,
+                    proxies=proxies,
+                    timeout=25, # Increased timeout slightly
+                    stream=True # Returns after the headers, so TTFB and download are timed apart
+                )
+                metrics.observe('ttfb', response.elapsed.total_seconds())
+                connect_seconds = take_connect_time()
+                if connect_seconds:
+                    metrics.observe('connect', connect_seconds)
+                metrics.inc('pages_fetched')
+                metrics.inc('retries', retry_count(response))
             logging.info(f"Request URL: {response.url}") # Log the exact URL requested
             logging.info(f"Response Status Code: {response.status_code}")
 
+            # Block markers are looked for in the raw bytes, and lxml builds
+            # the tree while the rest of the body is still downloading
+            reader = PageReader(PARSER_BACKEND, declared_encoding(response))
+            body_started = time.perf_counter()
+            feed_seconds = read_body(response, reader, metrics)
+            metrics.observe('download', time.perf_counter() - body_started - feed_seconds)
+            metrics.observe('feed', feed_seconds)
+            if not getattr(response, 'from_cache', False):
+                metrics.observe('request', time.perf_counter() - request_started)
+
             # Check for blocking indicators *before* raising for status
-            if any(x in response.text.lower() for x in ["/recaptcha/", "/sorry/"]) or response.status_code == 429:
+            if reader.blocked or response.status_code == 429:
                 logging.warning(f"Google block detected for query '{query}', page {page + 1}. Status: {response.status_code}")
                 print(f"WARN: Google block detected (Status: {response.status_code}). Stopping this query.")
-                 # Save HTML on block
-                with open(f"blocked_page_{page+1}.html", "w", encoding="utf-8") as f:
-                    f.write(response.text)
+                metrics.inc('blocked_pages')
+                save_artifact(ctx, "blocked", response, reader, username, query, page)
+                ctx.note_incomplete()
+                progress.close("blocked")
                 break
 
             response.raise_for_status() # Raise error for other bad status codes (4xx, 5xx)
+            live = not getattr(response, 'from_cache', False)
+            if cache and live:
+                cache.put(GOOGLE_SEARCH_URL, params, response, reader.content, reader.encoding)
 
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # --- SELECTOR UPDATE AREA ---
-            # YOU MUST UPDATE THESE SELECTORS BASED ON CURRENT GOOGLE HTML
-            # Use browser dev tools (F12 -> Inspect) on Google Search results
-            # Common patterns observed late 2023 / early 2024 (WILL CHANGE):
-            result_blocks = soup.find_all('div', class_='MjjYud') # Often contains organic results
-            if not result_blocks:
-                 result_blocks = soup.find_all('div', class_='kvH3mc') # Another potential container
-            # Add more attempts based on inspection...
-            # Example: result_blocks = soup.find_all('div', {'jscontroller': True, 'data-cid': True})
-
-            # --- END SELECTOR UPDATE AREA ---
+            with metrics.profile_parse():
+                block_count, page_results = reader.read_results(matcher, metrics)
+            metrics.inc('pages_parsed')
+            metrics.inc('blocks', block_count)
 
-            if not result_blocks:
+            if not block_count:
                 logging.warning(f"No result blocks found for query '{query}', page {page + 1} using current selectors. Saving HTML.")
                 print("WARN: No result blocks found. Google HTML structure may have changed. Check selectors!")
-                # --- Filename Sanitizing ---
-                safe_query_part = re.sub(r'[\\/*?:"<>|]', "", query)
-                safe_query_part = safe_query_part.replace(" ", "_")[:50]
-                debug_filename = f"debug_page_{safe_query_part}_{page+1}.html"
-                try:
-                    with open(debug_filename, "w", encoding="utf-8") as f:
-                        f.write(soup.prettify())
-                    print(f"Saved debug HTML to: {debug_filename}")
-                    logging.info(f"Saved debug HTML to: {debug_filename}")
-                except Exception as e_write:
-                    logging.error(f"Could not write debug file {debug_filename}: {e_write}")
-                    print(f"ERROR: Could not write debug file {debug_filename}: {e_write}")
+                # Raw response, exactly as the parser saw it (usable as a bench_parse.py fixture)
+                save_artifact(ctx, "no_blocks", response, reader, username, query, page)
+                metrics.inc('no_block_pages')
+                ctx.note_incomplete() # Not checkpointed, retried after a selector fix
+                progress.close("no result blocks")
                 continue # Go to next page or end loop
 
+            # Hits that only mention other targets go to those targets
+            other_hits = {}
+            for result in page_results:
+                for target in result['targets']:
+                    if target != username:
+                        other_hits.setdefault(target, []).append(result)
+            other_sinks = []
+            for target, results in other_hits.items():
+                if attribute_hits(target, results, query, ctx):
+                    other_sinks.append(ctx.target_results[target].sink)
+            page_results = [r for r in page_results if username in r['targets']]
+
+            unseen_results = [r for r in page_results if r['key'] not in added_keys] # Not yet seen by this query
+            page_keys = [r['key'] for r in unseen_results]
+            known_keys = seen_index.known(username, page_keys) if seen_index is not None else set()
+
             page_found_count = 0
-            for block in result_blocks:
-                # --- SELECTOR UPDATE AREA (Link, Title, Snippet) ---
-                link_tag = block.find('a', href=True)
-                title_tag = None
-                snippet_element = None
-
-                if link_tag:
-                     # Title is often within an h3 inside the link
-                     title_tag = link_tag.find('h3', class_=re.compile(r'LC20lb')) # Example class, UPDATE!
-                     if not title_tag: # Fallback: maybe title is elsewhere?
-                          title_tag = block.find('h3', class_=re.compile(r'title-class')) # UPDATE!
-
-                # Snippet location varies greatly. Look for divs/spans containing the text description.
-                # Often requires inspecting multiple potential classes.
-                snippet_container = block.find('div', class_=re.compile(r'VwiC3b|IsZvec')) # Example classes, UPDATE!
-                if snippet_container:
-                    # Sometimes snippet text is directly within, sometimes nested spans
-                    snippet_element = snippet_container.find('span') # Or might be snippet_container itself
-                    if not snippet_element:
-                         snippet_element = snippet_container # Use the container if no span inside
-
-                # --- END SELECTOR UPDATE AREA ---
-
-
-                if link_tag and link_tag['href'].startswith('http'):
-                    link = link_tag['href']
-                    title_text = title_tag.get_text(strip=True) if title_tag else "No Title Found"
-                    snippet_text = snippet_element.get_text(separator=" ", strip=True) if snippet_element else "No Snippet Found"
-
-                    is_post_link = link.startswith(("https://www.instagram.com/p/", "https://instagram.com/p/"))
-                    text_to_check = (title_text + " " + snippet_text).lower()
-                    username_mentioned = TARGET_USERNAME.lower() in text_to_check
-
-                    if is_post_link and username_mentioned:
-                        result = {
-                            'title': title_text,
-                            'link': link,
-                            'snippet': snippet_text[:250] # Store slightly longer snippet
-                        }
-                        # Add result only if the link hasn't been added before
-                        if result['link'] not in added_links:
-                            logging.info(f"Found potential hit: {result['link']}")
-                            print(f"  [Potential Hit] Title: {result['title']}")
-                            print(f"  Link: {result['link']}")
-                            print(f"  Snippet: {result['snippet']}...")
-                            print("-" * 20)
-                            found_results.append(result)
-                            added_links.add(result['link']) # Track added link
-                            page_found_count += 1
-
-            if page_found_count == 0 and result_blocks:
+            page_new_count = 0
+            for result in page_results:
+                # Add result only if the post hasn't been added before
+                if result['key'] not in added_keys:
+                    found_results.append(result)
+                    added_keys.add(result['key']) # Track added post
+                    page_found_count += 1
+                    in_this_run = target_results is not None and result['key'] in target_results
+                    if result['key'] in known_keys and not in_this_run:
+                        logging.info(f"Already known hit: {result['link']} (sighting merged into the seen index)")
+                        continue
+                    # Posts found by an earlier query only get this query and snippet merged in
+                    if target_results is None or target_results.add(result, query):
+                        page_new_count += 1
+                        logging.info(f"Found potential hit: {result['link']}")
+                        print(f"  [Potential Hit] Title: {result['title']}")
+                        print(f"  Link: {result['link']}")
+                        print(f"  Snippet: {result['snippet']}...")
+                        print("-" * 20)
+                    else:
+                        logging.info(f"Hit already found by another query: {result['link']}")
+
+            metrics.inc('hits', page_found_count)
+            metrics.inc('new_hits', page_new_count)
+            # Cached pages only hold posts the run that fetched them found, they say nothing about yield
+            progress.page_done(block_count, page_new_count, RESULTS_PER_PAGE, live)
+            if known_keys:
+                # New posts go into the index only once report_target() has saved them
+                seen_index.merge_sightings(username, [r for r in unseen_results if r['key'] in known_keys], query)
+            if checkpoint is not None:
+                checkpoint.mark_done(username, query, page, [sink, *other_sinks] if sink is not None else other_sinks,
+                                     outcome={"blocks": block_count, "new": page_new_count, "live": live})
+
+            if page_found_count == 0:
                 logging.info(f"No relevant Instagram post results found on page {page + 1} for query '{query}'")
                 print("  No relevant Instagram post results found on this page (mentioning username).")
+            elif len(known_keys) == page_found_count:
+                logging.info(f"All {page_found_count} hits on page {page + 1} for query '{query}' were already known")
+                print(f"  All {page_found_count} hits on this page were already reported.")
+
+            if progress.closed:
+                logging.info(f"Stopping query '{query}' after page {page + 1}: {progress.close_reason}")
+                break
 
         except requests.exceptions.RequestException as e:
             logging.error(f"Request error for query '{query}', page {page + 1}: {e}")
             # Don't print stack trace for common errors like timeouts
             print(f"ERROR: Request error processing query '{query}': {e}")
+            metrics.inc('request_errors')
+            ctx.note_incomplete()
+            progress.close("request error")
             break # Stop processing this query on significant error
         except Exception as e_main:
              logging.exception(f"Unexpected error processing query '{query}', page {page + 1}: {e_main}")
              print(f"ERROR: An unexpected error occurred: {e_main}")
-             # Optionally save HTML on unexpected error
-             try:
-                 with open(f"error_page_{page+1}.html", "w", encoding="utf-8") as f:
-                    f.write(response.text if 'response' in locals() else "No response object available")
-             except: pass
+             save_artifact(ctx, "error", response, reader, username, query, page)
+             ctx.note_incomplete()
+             progress.close("error")
              break # Stop query on unexpected error
 
 
         # --- Delay ---
-        if page < pages - 1:
+        # No need to pace pages that never left the machine, or that the scheduler paces
+        if page < last_page and not scheduler and response is not None and not getattr(response, 'from_cache', False):
             sleep_time = random.uniform(DELAY_BETWEEN_PAGES_MIN, DELAY_BETWEEN_PAGES_MAX)
             logging.info(f"Sleeping for {sleep_time:.2f} seconds before next page")
             print(f"Sleeping for {sleep_time:.2f} seconds before next page...")
-            time.sleep(sleep_time)
+            with metrics.timer('sleep'):
+                time.sleep(sleep_time)
 
     return found_results
 
 # --- Save Results ---
-def save_results(results):
-    """Save results to a JSON file."""
+def save_results(results, output_file=None):
+    """Save results (any iterable of dicts) to a JSON file (OUTPUT_FILE by default).
+
+    Results are written one at a time, so the output is never built as one
+    list or string. Returns the number saved, None if saving failed.
+    """
+    output_file = output_file or OUTPUT_FILE
+    count = 0
     try:
-        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
-        logging.info(f"Saved {len(results)} unique results to {OUTPUT_FILE}")
-        print(f"\nSaved {len(results)} unique results to {OUTPUT_FILE}")
+        with open(output_file, 'w', encoding='utf-8') as f:
+            # Same layout as json.dump(list, indent=2)
+            f.write('[')
+            for result in results:
+                f.write(',\n  ' if count else '\n  ')
+                f.write(json.dumps(result, indent=2, ensure_ascii=False).replace('\n', '\n  '))
+                count += 1
+            f.write('\n]' if count else ']')
+        logging.info(f"Saved {count} unique results to {output_file}")
+        print(f"\nSaved {count} unique results to {output_file}")
     except Exception as e:
-        logging.error(f"Failed to save results to {OUTPUT_FILE}: {e}")
-        print(f"ERROR: Failed to save results to {OUTPUT_FILE}: {e}")
+        logging.error(f"Failed to save results to {output_file}: {e}")
+        print(f"ERROR: Failed to save results to {output_file}: {e}")
+        return None
+    return count
+
+# --- Per-Target Run ---
+def run_target(username, session=None, ctx=None):
+    """Spend one username's page budget on its search queries.
+
+    Pages go one at a time to the query template with the best hit yield so
+    far (see query_planner.py and RunContext.yield_stats). A template stops
+    getting pages after a short page, a page without new posts, a block or
+    an error. Only live requests use up the budget. Hits are streamed to ctx.target_results[username] (see
+    RunContext). Returns the number of unique results for the target,
+    including those found before a resume. Without a scheduler, pages are
+    paced with DELAY_BETWEEN_PAGES_* sleeps and switches between queries
+    with DELAY_BETWEEN_QUERIES_* (single-target mode). With one, the shared
+    scheduler does all the pacing.
+    """
+    session = session or setup_session()
+    ctx = ctx or RunContext()
+    target_results = ctx.target_results.get(username)
+    budget = PAGES_PER_QUERY * len(SEARCH_QUERY_TEMPLATES)
+    planner = QueryPlanner(username, SEARCH_QUERY_TEMPLATES, budget, MAX_PAGES_PER_QUERY, ctx.yield_stats,
+                           empty_page_limit=SEEN_CUTOFF_PAGES)
+    checkpoint = ctx.checkpoint
+    if checkpoint is not None and checkpoint.has_progress(username):
+        # Continue the interrupted run's plan instead of planning afresh around its pages
+        resumed = planner.resume(lambda template: template.format(username=username),
+                                 lambda query, page: checkpoint.is_done(username, query, page),
+                                 lambda query, page: checkpoint.outcome(username, query, page),
+                                 RESULTS_PER_PAGE)
+        logging.info(f"Resumed {resumed} finished pages of '{username}', {planner.used}/{planner.budget} budget pages used")
+        print(f"--- '{username}': {resumed} pages already done, {planner.used}/{planner.budget} budget pages used ---")
+    previous_template = None
+    went_online = False
+
+    while not ctx.stop_event.is_set():
+        template = planner.next_template()
+        if template is None:
+            break
+        # Only pace pages that actually went to Google
+        if went_online and not ctx.scheduler:
+            if template == previous_template:
+                sleep_time = random.uniform(DELAY_BETWEEN_PAGES_MIN, DELAY_BETWEEN_PAGES_MAX)
+                print(f"Sleeping for {sleep_time:.2f} seconds before next page...")
+            else:
+                sleep_time = random.uniform(DELAY_BETWEEN_QUERIES_MIN, DELAY_BETWEEN_QUERIES_MAX)
+                print(f"\nSwitching query. Sleeping for {sleep_time:.2f} seconds...\n")
+            logging.info(f"Sleeping for {sleep_time:.2f} seconds")
+            with ctx.metrics.timer('sleep'):
+                time.sleep(sleep_time)
+
+        progress = planner.progress[template]
+        query = template.format(username=username)
+        if template != previous_template:
+            print(f"\n--- Processing Query [{query}] (expected yield {planner.expected_yield(template):.2f} new posts/page) ---")
+        logging.info(f"Processing query '{query}', page {progress.next_page + 1}, budget {planner.used}/{planner.budget} pages used")
+
+        requests_before = progress.requests_sent
+        known_before = target_results.count if target_results is not None else 0
+        query_results = fetch_search_results(query, pages=1, session=session, username=username, ctx=ctx,
+                                              first_page=progress.next_page, progress=progress)
+        went_online = progress.requests_sent > requests_before
+        previous_template = template
+
+        new_results_count = target_results.count - known_before if target_results is not None else len(query_results)
+        print(f"--- Found {len(query_results)} potential results ({new_results_count} new unique posts). ---")
+        if progress.closed:
+            print(f"--- Done with this query: {progress.close_reason}. ---")
+
+    logging.info(f"Page plan for '{username}' ({planner.used}/{planner.budget} pages used):\n  " + "\n  ".join(planner.summary()))
+    return target_results.count if target_results is not None else None
+
+def report_target(username, target_results, seen_index=None):
+    """Print the end-of-run summary for one target, save its posts and mark them seen."""
+    result_count = target_results.count
+    known_count = seen_index.count(username) if seen_index is not None else 0
+    if not result_count and known_count:
+        logging.info(f"No new links for '{username}' ({known_count} known from earlier runs)")
+        print(f"No new links for '{username}' since the last run ({known_count} known posts in {SEEN_INDEX_FILE}).")
+        save_results([], OUTPUT_FILE_TEMPLATE.format(username=username)) # Don't leave last run's hits looking new
+    elif result_count:
+        print(f"Found a total of {result_count} potential unique Instagram posts where '{username}' might be mentioned:")
+        # Optional: Print links at the end
+        # for record in target_results.posts.records():
+        #      print(f"- {record.to_dict()['link']}")
+        records = target_results.posts.records()
+        if save_results((record.to_dict() for record in records),
+                        OUTPUT_FILE_TEMPLATE.format(username=username)) is not None:
+            if seen_index is not None:
+                seen_index.record(username, records) # Reported: later runs won't report them again
+            target_results.saved()
+    else:
+        logging.warning(f"No potential links found for '{username}' across all queries with current selectors.")
+        print(f"No potential links found for '{username}'. This likely means:")
+        print("  a) The selectors need updating due to Google HTML changes.")
+        print("  b) Google hasn't indexed public posts mentioning the user recently.")
+        print("  c) The user has low public activity indexed by Google.")
+
+def load_targets(args):
+    """Usernames from --targets / --targets-file, in order and without duplicates."""
+    targets = list(args.targets or [])
+    if args.targets_file:
+        with open(args.targets_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.split('#', 1)[0].strip() # Allow comments and blank lines
+                if line:
+                    targets.append(line)
+    return list(dict.fromkeys(t.lstrip('@') for t in targets))
 
 # --- Main Execution ---
 if __name__ == "__main__":
-    if not TARGET_USERNAME or TARGET_USERNAME == "replace_with_target_instagram_username":
+    arg_parser = argparse.ArgumentParser(description="Search Google for Instagram posts mentioning a username.")
+    arg_parser.add_argument("--replay", action="store_true", help="Serve pages only from the response cache (no network)")
+    arg_parser.add_argument("--use-cache", action="store_true",
+                            help="Serve pages cached within CACHE_TTL_SECONDS instead of fetching them (re-runs, not monitoring)")
+    arg_parser.add_argument("--no-cache", action="store_true", help="Don't read or write the response cache")
+    arg_parser.add_argument("--targets", nargs="+", metavar="USERNAME", help="Batch mode: search for several usernames")
+    arg_parser.add_argument("--targets-file", metavar="PATH", help="Batch mode: file with one username per line")
+    arg_parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help="Batch mode: targets processed in parallel")
+    arg_parser.add_argument("--fresh", action="store_true", help="Ignore the checkpoint of an interrupted run and start over")
+    arg_parser.add_argument("--no-seen-index", action="store_true", help="Report every hit, not only links unseen by earlier runs")
+    arg_parser.add_argument("--metrics-prom", metavar="PATH", help="Also write the run metrics in Prometheus text format")
+    arg_parser.add_argument("--metrics-port", type=int, metavar="PORT", help="Serve live Prometheus metrics on localhost:PORT/metrics")
+    arg_parser.add_argument("--profile-parse", metavar="PATH",
+                            help="cProfile the parse work (feeding body chunks to the parser and "
+                                 "finishing the tree, not extraction or the network) and dump the stats here")
+    args = arg_parser.parse_args()
+    if args.replay and args.no_cache:
+        arg_parser.error("--replay needs the response cache, it can't be combined with --no-cache")
+    if args.use_cache and args.no_cache:
+        arg_parser.error("--use-cache and --no-cache contradict each other")
+
+    setup_logging()
+    targets = load_targets(args)
+    batch_mode = bool(targets)
+    if not batch_mode:
+        targets = [TARGET_USERNAME]
+
+    if not batch_mode and (not TARGET_USERNAME or TARGET_USERNAME == "replace_with_target_instagram_username"):
         logging.critical("TARGET_USERNAME not set in script.")
         print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
         print("!!! ERROR: Please set the TARGET_USERNAME variable in the   !!!")
         print("!!!        script before running.                           !!!")
         print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
     else:
-        print(f"--- Starting OSINT Google Search for Instagram User: {TARGET_USERNAME} ---")
+        if batch_mode:
+            print(f"--- Starting OSINT Google Search for {len(targets)} Instagram users ({args.workers} workers) ---")
+        else:
+            print(f"--- Starting OSINT Google Search for Instagram User: {TARGET_USERNAME} ---")
         print(f"--- Logging to: {LOG_FILE} ---")
-        print(f"--- Results will be saved to: {OUTPUT_FILE} ---")
+        print(f"--- Results will be saved to: {OUTPUT_FILE_TEMPLATE if batch_mode else OUTPUT_FILE} ---")
         print("!!! WARNING: This method is NOT reliable or comprehensive. Relies on fragile selectors. !!!")
         print("-" * 60)
-        logging.info(f"Script started. Target: {TARGET_USERNAME}")
-
-        session = setup_session()
-        all_potential_results = []
-        processed_links = set() # Track links across all queries
-
-        for i, query in enumerate(SEARCH_QUERIES):
-            print(f"\n--- Processing Query {i+1}/{len(SEARCH_QUERIES)}: [{query}] ---")
-            logging.info(f"Processing query {i+1}: {query}")
-
-            query_results = fetch_search_results(query, pages=PAGES_PER_QUERY, session=session)
-
-            new_results_count = 0
-            for result in query_results:
-                if result['link'] not in processed_links:
-                    all_potential_results.append(result)
-                    processed_links.add(result['link'])
-                    new_results_count += 1
-
-            print(f"--- Query {i+1} finished. Found {len(query_results)} potential results ({new_results_count} new unique links). ---")
-            logging.info(f"Query {i+1} finished. Found {len(query_results)} results, {new_results_count} new unique.")
-
-
-            # Delay between different queries
-            if i < len(SEARCH_QUERIES) - 1:
-                sleep_time = random.uniform(DELAY_BETWEEN_QUERIES_MIN, DELAY_BETWEEN_QUERIES_MAX)
-                logging.info(f"Sleeping for {sleep_time:.2f} seconds before next query")
-                print(f"\nSwitching query. Sleeping for {sleep_time:.2f} seconds...\n")
-                time.sleep(sleep_time)
+        logging.info(f"Script started. Targets: {', '.join(targets)}")
+
+        cache = None if args.no_cache else ResponseCache(CACHE_DIR, CACHE_TTL_SECONDS, CACHE_MAX_BYTES)
+        if args.replay:
+            print(f"--- Replay mode: serving pages from {CACHE_DIR} only ---")
+
+        checkpoint = Checkpoint(CHECKPOINT_FILE, max_age=CHECKPOINT_MAX_AGE_SECONDS)
+        if args.fresh:
+            checkpoint.clear()
+        elif len(checkpoint):
+            started = time.ctime(checkpoint.started_at) if checkpoint.started_at else "an unknown time"
+            print(f"--- Resuming the run started {started} from {CHECKPOINT_FILE}: "
+                  f"{len(checkpoint)} pages already done (use --fresh to start over) ---")
+        elif checkpoint.discarded_stale:
+            print(f"--- Ignored a checkpoint older than {CHECKPOINT_MAX_AGE_SECONDS // 3600} hours, starting a new run ---")
+
+        # One shared request budget for all targets in batch mode, see BATCH_WORKERS
+        scheduler = HostRateScheduler(DELAY_BETWEEN_PAGES_MIN, DELAY_BETWEEN_PAGES_MAX) if batch_mode else None
+        seen_index = None if args.no_seen_index else SeenIndex(SEEN_INDEX_FILE)
+        yield_stats = YieldStats(YIELD_STATS_FILE)
+        metrics = Metrics(profile_parse=bool(args.profile_parse))
+        metrics_server = metrics.serve(args.metrics_port) if args.metrics_port else None
+        if metrics_server:
+            print(f"--- Live metrics on http://127.0.0.1:{args.metrics_port}/metrics ---")
+        artifacts = ArtifactStore(ARTIFACT_DIR, ARTIFACT_MAX_BYTES)
+        # One matcher for all targets: every hit is attributed to each target it mentions
+        ctx = RunContext(cache, args.replay, scheduler, checkpoint, seen_index, UsernameMatcher(targets), metrics,
+                         artifacts, yield_stats, read_cache=args.use_cache)
+        finished_targets = []
+        interrupted = failed = False
+        try:
+            ctx.open_results(targets)
+            if batch_mode:
+                executor = ThreadPoolExecutor(max_workers=max(1, args.workers), thread_name_prefix="target")
+                try:
+                    futures = {
+                        executor.submit(run_target, username, setup_session(), ctx): username
+                        for username in targets
+                    }
+                    for future in as_completed(futures):
+                        username = futures[future]
+                        try:
+                            result_count = future.result()
+                        except Exception as e:
+                            logging.exception(f"Target '{username}' failed: {e}")
+                            print(f"ERROR: Target '{username}' failed: {e}")
+                            failed = True
+                            continue
+                        finished_targets.append(username)
+                        print(f"\n=== Target '{username}' done ({result_count} results so far) ===")
+                except KeyboardInterrupt:
+                    ctx.stop_event.set() # Workers stop after their current page
+                    raise
+                finally:
+                    executor.shutdown(wait=True, cancel_futures=True)
+            else:
+                run_target(TARGET_USERNAME, setup_session(), ctx)
+                finished_targets.append(TARGET_USERNAME)
+        except KeyboardInterrupt:
+            interrupted = True
+            logging.warning("Interrupted by user.")
+            print("\nWARN: Interrupted. Hits found so far are in the .jsonl files (the next run carries them over).")
+        finally:
+            ctx.close_results()
+            checkpoint.flush()
 
         print("\n" + "=" * 60)
-        print("--- Search Complete ---")
+        print("--- Search Complete ---" if not interrupted else "--- Search Interrupted ---")
+        if cache and (args.replay or args.use_cache):
+            print(f"Response cache: {cache.hits} hits, {cache.misses} misses")
+            logging.info(f"Response cache: {cache.hits} hits, {cache.misses} misses")
         logging.info("All queries processed.")
 
-        if all_potential_results:
-            print(f"Found a total of {len(all_potential_results)} potential unique Instagram post links where '{TARGET_USERNAME}' might be mentioned:")
-            # Optional: Print links at the end
-            # for result in all_potential_results:
-            #      print(f"- {result['link']}")
-            save_results(all_potential_results)
+        # Saved only now: other targets' queries can attribute hits until the very end
+        if not interrupted:
+            for username in targets:
+                report_target(username, ctx.target_results[username], seen_index)
+        if batch_mode:
+            total = sum(target_results.count for target_results in ctx.target_results.values())
+            print(f"Processed {len(finished_targets)}/{len(targets)} targets, {total} potential results in total.")
+
+        if interrupted or failed or ctx.incomplete_pages:
+            # incomplete_pages counts pages skipped or failed, not what an interruption left undone
+            reason = "interrupted" if interrupted else "a target failed" if failed else \
+                f"{ctx.incomplete_pages} pages skipped or failed"
+            print(f"Progress saved to {CHECKPOINT_FILE}: re-run the same command within "
+                  f"{CHECKPOINT_MAX_AGE_SECONDS // 3600} hours to resume ({reason}).")
+            logging.info(f"Checkpoint kept ({reason}, {ctx.incomplete_pages} incomplete pages).")
         else:
-            logging.warning(f"No potential links found for '{TARGET_USERNAME}' across all queries with current selectors.")
-            print(f"No potential links found for '{TARGET_USERNAME}'. This likely means:")
-            print("  a) The selectors need updating due to Google HTML changes.")
-            print("  b) Google hasn't indexed public posts mentioning the user recently.")
-            print("  c) The user has low public activity indexed by Google.")
+            checkpoint.clear() # Campaign finished, next run starts fresh
+
+        if seen_index is not None:
+            seen_index.close()
+        yield_stats.close()
+
+        metrics.print_summary()
+        metrics.write_summary(METRICS_SUMMARY_FILE)
+        print(f"Run metrics saved to: {METRICS_SUMMARY_FILE}")
+        if args.metrics_prom:
+            metrics.write_prometheus(args.metrics_prom)
+        if args.profile_parse:
+            metrics.write_profile(args.profile_parse)
+            print(f"Parse profile saved to: {args.profile_parse} (view with: python -m pstats {args.profile_parse})")
+        if metrics_server:
+            metrics_server.shutdown()
 
         print("\n--- Important Notes ---")
         print("1. Verify links manually. Mention != Comment by user.")
@@ -325,4 +886,4 @@ if __name__ == "__main__":
         print("3. Check the log file ({LOG_FILE}) for detailed information and errors.")
         print("4. Avoid running too frequently to prevent Google blocks.")
         print("=" * 60)
-        logging.info("Script finished.")
\ No newline at end of file
+        logging.info("Script finished.")
@@ -0,0 +1,208 @@
+import contextlib
+import cProfile
+import http.server
+import json
+import logging
+import random
+import threading
+import time
+
+# ==============================================================================
+# == Run metrics ==
+# ==============================================================================
+# Per-stage timers, counters and histograms for the fetch/parse pipeline, so a
+# slow run can be pinned on the network, the parser or the pacing sleeps.
+#
+# Stages recorded by main.py (seconds):
+#   wait      - waiting for a HostRateScheduler slot
+#   sleep     - DELAY_BETWEEN_* sleeps (single-target mode)
+#   cache_read- reading a page from the response cache
+#   connect   - opening new connections (TCP + TLS), only for requests that
+#               needed one; part of ttfb
+#   ttfb      - request sent -> response headers (includes connect and
+#               urllib3 retries with their backoff)
+#   download  - waiting for body chunks after the headers (feed excluded)
+#   feed      - handing body chunks to the PageReader: block-marker scan,
+#               charset decoding and (lxml) incremental parsing. Decoding
+#               happens inside the parser, so it has no stage of its own
+#   request   - request sent -> full body (ttfb + download + feed)
+#   parse     - finishing the tree once the body is in (html.parser: all of it)
+#   extract   - tree -> hits (selectors + username matching)
+#
+# Exported as a JSON run summary, Prometheus text (file or /metrics endpoint)
+# and, optionally, a cProfile dump of the parse work (feed + parse).
+
+METRIC_PREFIX = "scraper"
+# Histogram bucket upper bounds in seconds (Prometheus style, +Inf implied)
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+RESERVOIR_SIZE = 2048 # Samples kept per stage for percentiles
+
+
+class _Histogram:
+    """Bucket counts for Prometheus plus a bounded sample reservoir for percentiles."""
+
+    def __init__(self):
+        self.buckets = [0] * len(STAGE_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = []
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        for i, bound in enumerate(STAGE_BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+                break
+        # Reservoir sampling keeps memory flat on long runs
+        if len(self.samples) < RESERVOIR_SIZE:
+            self.samples.append(value)
+        else:
+            slot = random.randrange(self.count)
+            if slot < RESERVOIR_SIZE:
+                self.samples[slot] = value
+
+    def percentile(self, pct):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+class Metrics:
+    """Thread-safe collector shared by every worker of a run."""
+
+    def __init__(self, profile_parse=False):
+        self.started_at = time.time()
+        self.counters = {}
+        self.stages = {}
+        self._lock = threading.Lock()
+        # cProfile only sees the thread that enabled it, and one Profile can't
+        # be enabled twice, so profiled parses are serialized.
+        self.profiler = cProfile.Profile() if profile_parse else None
+        self._profile_lock = threading.Lock()
+
+    def inc(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = _Histogram()
+            hist.observe(seconds)
+
+    @contextlib.contextmanager
+    def timer(self, stage):
+        """Time the with-block as one `stage` observation."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - started)
+
+    @contextlib.contextmanager
+    def profile_parse(self):
+        """cProfile the with-block if parse profiling is on, else do nothing."""
+        if self.profiler is None:
+            yield
+            return
+        with self._profile_lock:
+            self.profiler.enable()
+            try:
+                yield
+            finally:
+                self.profiler.disable()
+
+    # --- Export ---
+
+    def summary(self):
+        """Run summary as a JSON-serializable dict."""
+        with self._lock:
+            stages = {
+                name: {
+                    "count": h.count,
+                    "total_s": round(h.total, 6),
+                    "mean_s": round(h.total / h.count, 6) if h.count else 0.0,
+                    "p50_s": round(h.percentile(50), 6),
+                    "p95_s": round(h.percentile(95), 6),
+                    "p99_s": round(h.percentile(99), 6),
+                    "max_s": round(h.max, 6),
+                }
+                for name, h in sorted(self.stages.items())
+            }
+            counters = dict(sorted(self.counters.items()))
+        return {
+            "started_at": self.started_at,
+            "wall_s": round(time.time() - self.started_at, 3),
+            "counters": counters,
+            "stages": stages,
+        }
+
+    def to_prometheus(self):
+        """Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                metric = f"{METRIC_PREFIX}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+            metric = f"{METRIC_PREFIX}_stage_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for stage, h in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, n in zip(STAGE_BUCKETS, h.buckets):
+                    cumulative += n
+                    lines.append(f'{metric}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {h.total}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+    def write_summary(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def write_prometheus(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+
+    def write_profile(self, path):
+        if self.profiler is not None:
+            self.profiler.dump_stats(path) # Inspect with: python -m pstats <path>
+
+    def serve(self, port, host="127.0.0.1"):
+        """Expose /metrics on a daemon thread; returns the server (call shutdown())."""
+        metrics = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logging.debug(f"metrics endpoint: {format % args}")
+
+        server = http.server.ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+        return server
+
+    def print_summary(self):
+        """Console table of where the time went."""
+        summary = self.summary()
+        print(f"--- Run metrics ({summary['wall_s']:.1f}s wall) ---")
+        for stage, s in summary["stages"].items():
+            print(f"  {stage:<10} n={s['count']:<6} total={s['total_s']:9.3f}s  mean={s['mean_s'] * 1000:8.2f}ms  "
+                  f"p95={s['p95_s'] * 1000:8.2f}ms  max={s['max_s'] * 1000:8.2f}ms")
+        if summary["counters"]:
+            print("  " + ", ".join(f"{k}={v}" for k, v in summary["counters"].items()))
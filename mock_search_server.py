@@ -0,0 +1,253 @@
+import argparse
+import glob
+import hashlib
+import http.server
+import os
+import random
+import re
+import threading
+import time
+import urllib.parse
+
+# ==============================================================================
+# == Local mock search server ==
+# ==============================================================================
+# Stand-in for GOOGLE_SEARCH_URL so fetching, retries, the scheduler and the
+# parser can be exercised offline. It serves result pages on any path (e.g.
+# /search), either synthesized from the query (10 result blocks using the
+# same classes as the real selectors, some Instagram posts mentioning the
+# quoted username) or picked from saved fixture pages.
+#
+# Failure and slowness are injected per request:
+#   --latency     delay before the response headers, e.g. "fixed:0.05",
+#                 "uniform:0.02,0.3", "lognormal:-2.5,0.8" (mu, sigma of
+#                 ln seconds) or "exp:0.1" (mean)
+#   --rate-429    share of requests answered 429 (optionally with Retry-After)
+#   --error-rate  share answered 503
+#   --chunk-bytes / --chunk-delay   slow body: the page is written in chunks
+#                 with a pause after each one
+#
+#   python mock_search_server.py --port 8765 --latency lognormal:-2.5,0.8 --rate-429 0.05
+#   then set GOOGLE_SEARCH_URL = "http://127.0.0.1:8765/search" (or use load_test.py)
+#
+# --write-fixtures DIR writes the synthetic pages committed under fixtures/
+# (bench_parse.py's default corpus) instead of serving; they are the same on
+# every run, so a parse baseline is reproducible from a fresh checkout.
+
+RESULTS_PER_PAGE = 10
+_QUOTED_RE = re.compile(r'"([^"]+)"')
+# (query, start, padding_kb) of every page --write-fixtures writes: a few
+# small pages and a few padded with inline script like a real result page
+FIXTURE_PAGES = [
+    ('"leanbeefpatty" site:instagram.com', 0, 0),
+    ('"leanbeefpatty" site:instagram.com', 10, 0),
+    ('"leanbeefpatty" site:instagram.com', 20, 32),
+    ('from:leanbeefpatty site:instagram.com', 0, 0),
+    ('from:leanbeefpatty site:instagram.com', 10, 32),
+    ('"leanbeefpatty" commented on site:instagram.com', 0, 32),
+    ('"leanbeefpatty" commented on site:instagram.com', 10, 0),
+    ('"leanbeefpatty" commented on site:instagram.com', 20, 32),
+]
+
+
+def parse_latency(spec):
+    """Turn a latency spec ("kind:params") into a function rng -> seconds."""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v.strip()]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    if kind == "exp" and len(values) == 1:
+        return lambda rng: rng.expovariate(1 / values[0]) if values[0] > 0 else 0.0
+    raise ValueError(f"Bad latency spec {spec!r} (fixed:S, uniform:MIN,MAX, lognormal:MU,SIGMA or exp:MEAN)")
+
+
+def page_seed(query, start):
+    """Stable per-page number, so every run gets the same page for a (query, start)."""
+    return int.from_bytes(hashlib.sha256(f"{query}|{start}".encode("utf-8")).digest()[:8], "big")
+
+
+def synthetic_page(query, start, mention_rate=0.5, padding_kb=0):
+    """Result page for `query`, the same for the same (query, start)."""
+    seed = page_seed(query, start)
+    rng = random.Random(seed)
+    quoted = _QUOTED_RE.search(query)
+    username = quoted.group(1) if quoted else (query.split() or ["someone"])[0]
+    blocks = []
+    for i in range(RESULTS_PER_PAGE):
+        shortcode = f"M{seed % 100000:05d}{start + i:03d}"
+        host = rng.choice(["https://www.instagram.com", "https://instagram.com", "https://example.com"])
+        who = username if rng.random() < mention_rate else rng.choice(["someone", "another.user", "third_user"])
+        blocks.append(
+            f'<div class="MjjYud"><div class="g"><a href="{host}/p/{shortcode}/" data-ved="x">'
+            f'<h3 class="LC20lb MBeuO DKV0Md">Post by <b>{who}</b> on Instagram</h3></a>'
+            f'<div class="VwiC3b yXK7lf"><span>Jan {i + 1}, 2024 — <em>{who}</em> commented: '
+            f'nice photo &amp; more text here.</span></div></div></div>'
+        )
+    # Real result pages are mostly inline script; padding brings the size closer
+    padding = f"<script>var pad='{'x' * (padding_kb * 1024)}';</script>" if padding_kb else ""
+    return (
+        f"<!doctype html><html><head><meta charset='utf-8'><title>{query} - Search</title>{padding}</head>"
+        f"<body><div id='search'>{''.join(blocks)}</div></body></html>"
+    ).encode("utf-8")
+
+
+def write_fixtures(out_dir):
+    """Write FIXTURE_PAGES as synthetic_<n>.html into `out_dir`; return the paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for n, (query, start, padding_kb) in enumerate(FIXTURE_PAGES, 1):
+        path = os.path.join(out_dir, f"synthetic_{n:02d}.html")
+        with open(path, "wb") as f:
+            f.write(synthetic_page(query, start, padding_kb=padding_kb))
+        paths.append(path)
+    return paths
+
+
+class MockBehavior:
+    """What the mock server serves and how badly it behaves."""
+
+    def __init__(self, latency="fixed:0", rate_429=0.0, error_rate=0.0, retry_after=None,
+                 chunk_bytes=None, chunk_delay=0.0, padding_kb=0, mention_rate=0.5, fixtures=None, seed=None):
+        self.latency = parse_latency(latency)
+        self.rate_429 = rate_429
+        self.error_rate = error_rate
+        self.retry_after = retry_after # Seconds sent in Retry-After on 429, None = no header
+        self.chunk_bytes = chunk_bytes # None = whole body in one write
+        self.chunk_delay = chunk_delay
+        self.padding_kb = padding_kb
+        self.mention_rate = mention_rate
+        self.fixtures = [open(p, "rb").read() for p in sorted(fixtures or [])]
+        self.rng = random.Random(seed)
+        self.stats = {"requests": 0, "200": 0, "429": 0, "503": 0}
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """Pick (latency, status) for the next request."""
+        with self._lock:
+            self.stats["requests"] += 1
+            latency = max(0.0, self.latency(self.rng))
+            roll = self.rng.random()
+        if roll < self.rate_429:
+            return latency, 429
+        if roll < self.rate_429 + self.error_rate:
+            return latency, 503
+        return latency, 200
+
+    def count(self, status):
+        with self._lock:
+            self.stats[str(status)] = self.stats.get(str(status), 0) + 1
+
+    def page(self, query, start):
+        if self.fixtures:
+            return self.fixtures[page_seed(query, start) % len(self.fixtures)]
+        return synthetic_page(query, start, self.mention_rate, self.padding_kb)
+
+
+def make_handler(behavior):
+    class MockSearchHandler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1" # Keep-alive, so connection pooling is exercised too
+        disable_nagle_algorithm = True # Headers and body go out in separate writes, don't add ~40ms ACK delays
+
+        def do_GET(self):
+            params = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+            query = params.get("q", [""])[0]
+            try:
+                start = int(params.get("start", ["0"])[0])
+            except ValueError:
+                start = 0
+
+            latency, status = behavior.draw()
+            time.sleep(latency)
+            behavior.count(status)
+            if status != 200:
+                body = f"<html><body>Error {status}</body></html>".encode("utf-8")
+                self.send_response(status)
+                if status == 429 and behavior.retry_after is not None:
+                    self.send_header("Retry-After", str(behavior.retry_after))
+            else:
+                body = behavior.page(query, start)
+                self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=UTF-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+
+            step = behavior.chunk_bytes or len(body) or 1
+            for offset in range(0, len(body), step):
+                self.wfile.write(body[offset:offset + step])
+                if behavior.chunk_delay and offset + step < len(body):
+                    self.wfile.flush()
+                    time.sleep(behavior.chunk_delay)
+
+        def log_message(self, format, *args):
+            pass # Thousands of requests per run, keep the console quiet
+
+    return MockSearchHandler
+
+
+def start_mock_server(behavior, host="127.0.0.1", port=0):
+    """Serve on a daemon thread; return (server, search_url). Call server.shutdown() when done."""
+    server = http.server.ThreadingHTTPServer((host, port), make_handler(behavior))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-search", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/search"
+
+
+def add_behavior_arguments(arg_parser):
+    """CLI options for MockBehavior (shared with load_test.py)."""
+    group = arg_parser.add_argument_group("mock server behavior")
+    group.add_argument("--latency", default="fixed:0", help="Header latency: fixed:S, uniform:MIN,MAX, lognormal:MU,SIGMA or exp:MEAN")
+    group.add_argument("--rate-429", type=float, default=0.0, help="Share of requests answered 429")
+    group.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered 503")
+    group.add_argument("--retry-after", type=int, help="Send Retry-After: N with every 429")
+    group.add_argument("--chunk-bytes", type=int, help="Write the body in chunks of N bytes")
+    group.add_argument("--chunk-delay", type=float, default=0.0, help="Pause after each body chunk (seconds)")
+    group.add_argument("--padding-kb", type=int, default=0, help="Inline script padding per synthetic page")
+    group.add_argument("--mention-rate", type=float, default=0.5, help="Share of synthetic results mentioning the username")
+    group.add_argument("--fixtures", nargs="+", metavar="GLOB", help="Serve these saved pages instead of synthetic ones")
+    group.add_argument("--seed", type=int, help="Seed for latency/failure draws (reproducible runs)")
+
+
+def behavior_from_args(args):
+    fixtures = sorted({p for pattern in args.fixtures or [] for p in glob.glob(pattern)})
+    return MockBehavior(
+        latency=args.latency,
+        rate_429=args.rate_429,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+        chunk_bytes=args.chunk_bytes,
+        chunk_delay=args.chunk_delay,
+        padding_kb=args.padding_kb,
+        mention_rate=args.mention_rate,
+        fixtures=fixtures,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Local mock of the search endpoint for offline runs.")
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--write-fixtures", metavar="DIR", help="Write the synthetic fixture pages to DIR and exit")
+    add_behavior_arguments(arg_parser)
+    args = arg_parser.parse_args()
+    if args.write_fixtures:
+        for path in write_fixtures(args.write_fixtures):
+            print(f"Wrote {path}")
+        raise SystemExit(0)
+    try:
+        behavior = behavior_from_args(args)
+    except ValueError as e:
+        arg_parser.error(str(e))
+
+    server, url = start_mock_server(behavior, args.host, args.port)
+    print(f"Mock search server on {url} (Ctrl-C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(f"Served: {behavior.stats}")
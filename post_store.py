@@ -0,0 +1,139 @@
+import re
+import sys
+import threading
+import urllib.parse
+
+# ==============================================================================
+# == Canonical post store ==
+# ==============================================================================
+# Google returns the same Instagram post under many URLs: with and without
+# "www." or "m.", http or https, with tracking query strings, as /p/X/c/<id>
+# comment permalinks or /<user>/p/X/. All of them are keyed by the post's
+# shortcode X, and every sighting of a post is merged into one PostRecord
+# that keeps the queries, snippets, URL variants and targets that surfaced it.
+# Manual verification then works through unique posts, not unique URLs.
+
+INSTAGRAM_HOSTS = frozenset(["instagram.com", "www.instagram.com", "m.instagram.com"])
+_SHORTCODE_RE = re.compile(r"[A-Za-z0-9_-]+")
+
+
+def post_key(link):
+    """Shortcode of an Instagram post link, None if `link` is not a post."""
+    try:
+        parts = urllib.parse.urlsplit(link)
+        host = parts.hostname
+    except ValueError: # Malformed URL (e.g. bad port)
+        return None
+    if parts.scheme not in ("http", "https") or host not in INSTAGRAM_HOSTS:
+        return None
+    segments = [s for s in parts.path.split("/") if s]
+    # /p/<code>/... or /<username>/p/<code>/...
+    for i in (0, 1):
+        if len(segments) > i + 1 and segments[i] == "p" and _SHORTCODE_RE.fullmatch(segments[i + 1]):
+            return segments[i + 1] # Case-sensitive, "ABC" and "abc" are different posts
+    return None
+
+
+def post_url(key):
+    """Canonical link of a post."""
+    return f"https://www.instagram.com/p/{key}/"
+
+
+def _add(values, value):
+    """Append to a list used as a small ordered set; return True if it was new."""
+    if value is None or value in values:
+        return False
+    values.append(value)
+    return True
+
+
+class PostRecord:
+    """One post and everything that surfaced it.
+
+    Lists are used as ordered sets: a post is seen a handful of times, so
+    they are smaller than sets and keep first-seen order for the output.
+    """
+
+    __slots__ = ("key", "title", "snippets", "links", "queries", "targets")
+
+    def __init__(self, key, title):
+        self.key = key
+        self.title = title
+        self.snippets = []
+        self.links = []
+        self.queries = []
+        self.targets = []
+
+    def merge(self, link, snippet, query, targets):
+        """Fold one sighting in; return True if it added anything."""
+        changed = _add(self.links, link)
+        changed |= _add(self.snippets, snippet)
+        changed |= _add(self.queries, sys.intern(query) if query else None) # Shared by many posts
+        for target in targets:
+            changed |= _add(self.targets, target)
+        return changed
+
+    def merge_record(self, other):
+        """Fold in another record of the same post."""
+        for values, more in ((self.snippets, other.snippets), (self.links, other.links),
+                             (self.queries, other.queries), (self.targets, other.targets)):
+            for value in more:
+                _add(values, value)
+
+    @classmethod
+    def from_dict(cls, key, data):
+        """Rebuild a record saved with to_dict()."""
+        record = cls(key, data.get('title'))
+        record.snippets = list(data.get('snippets', ()))
+        record.links = list(data.get('links', ()))
+        record.queries = [sys.intern(q) for q in data.get('queries', ())]
+        record.targets = list(data.get('targets', ()))
+        return record
+
+    def to_dict(self):
+        return {
+            'title': self.title,
+            'link': post_url(self.key),
+            'snippet': self.snippets[0] if self.snippets else "",
+            'snippets': self.snippets,
+            'links': self.links,
+            'queries': self.queries,
+            'targets': self.targets,
+        }
+
+
+class PostStore:
+    """Thread-safe shortcode -> PostRecord map."""
+
+    def __init__(self):
+        self.posts = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.posts)
+
+    def __contains__(self, key):
+        return key in self.posts
+
+    def add(self, result, query):
+        """Merge a parsed result (dict with link/title/snippet/targets) in.
+
+        Returns (is_new, changed): whether the post was unknown, and whether
+        the sighting added anything (new post, query, snippet, URL or target).
+        Results that aren't post links are ignored.
+        """
+        key = result.get('key') or post_key(result['link'])
+        if key is None:
+            return False, False
+        with self._lock:
+            record = self.posts.get(key)
+            is_new = record is None
+            if is_new:
+                record = self.posts[key] = PostRecord(key, result['title'])
+            changed = record.merge(result['link'], result['snippet'], query, result.get('targets', ()))
+        return is_new, is_new or changed
+
+    def records(self):
+        """All posts in first-seen order."""
+        with self._lock:
+            return list(self.posts.values())
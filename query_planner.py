@@ -0,0 +1,214 @@
+import sqlite3
+import threading
+import time
+
+# ==============================================================================
+# == Adaptive page planner ==
+# ==============================================================================
+# Spends a target's page budget where it finds new posts. Instead of a fixed
+# number of pages for every query template, each next page goes to the open
+# template with the best expected yield (new posts per page):
+#
+#   (new posts + PRIOR_WEIGHT * prior) / (pages + PRIOR_WEIGHT)
+#
+# counted over this target's earlier runs and this run. The prior is the
+# template's yield over all targets, or an optimistic DEFAULT_PRIOR_YIELD for
+# a template never tried, so new templates get explored. A template is closed
+# for the run once a page comes back short (no further pages exist), after
+# `empty_page_limit` live pages in a row without new posts, when it is
+# blocked or fails, or once MAX_PAGES_PER_QUERY is reached.
+#
+# Only live requests count against the budget and only live pages teach the
+# planner: cached/replayed pages are free and are all "known" by the seen
+# index, so they neither record a yield nor trip the no-new-posts rule.
+# A resumed run first replays every page the interrupted run finished
+# (resume(), from the checkpoint) so it continues that plan: those pages
+# count against the budget and close templates as they did, and their
+# yield, already in YieldStats, is not counted twice. YieldStats persists
+# the counts in SQLite so later runs start informed.
+
+DEFAULT_PRIOR_YIELD = 5.0 # New posts per page assumed for a template with no history
+PRIOR_WEIGHT = 2.0 # How many pages' worth of evidence the prior counts as
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_yield (
+    target     TEXT NOT NULL,
+    template   TEXT NOT NULL,
+    pages      INTEGER NOT NULL,
+    new_posts  INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (target, template)
+) WITHOUT ROWID
+"""
+
+
+class YieldStats:
+    """Thread-safe (target, template) -> pages fetched / new posts found, across runs."""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def record(self, target, template, pages, new_posts):
+        with self._lock, self._conn: # Commits on success
+            self._conn.execute(
+                "INSERT INTO query_yield (target, template, pages, new_posts, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(target, template) DO UPDATE SET pages = pages + excluded.pages, "
+                "new_posts = new_posts + excluded.new_posts, updated_at = excluded.updated_at",
+                (target, template, pages, new_posts, time.time()),
+            )
+
+    def target_totals(self, target):
+        """template -> (pages, new_posts) for one target."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT template, pages, new_posts FROM query_yield WHERE target = ?", (target,)
+            ).fetchall()
+        return {template: (pages, new_posts) for template, pages, new_posts in rows}
+
+    def template_totals(self):
+        """template -> (pages, new_posts) summed over all targets."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT template, SUM(pages), SUM(new_posts) FROM query_yield GROUP BY template"
+            ).fetchall()
+        return {template: (pages, new_posts) for template, pages, new_posts in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class QueryProgress:
+    """This run's progress on one (target, template), updated by fetch_search_results."""
+
+    def __init__(self, target, template, yield_stats=None, empty_page_limit=1, max_pages=None):
+        self.target = target
+        self.template = template
+        self.empty_page_limit = empty_page_limit
+        self.max_pages = max_pages # Page cap of the template, None = whatever the caller asks for
+        self.next_page = 0 # Page index to fetch next
+        self.pages = 0 # Budget used: live requests, including those of resumed pages
+        self.requests_sent = 0 # Live requests sent by this run
+        self.new_posts = 0
+        self.live_pages = 0 # Live pages parsed by this run, the evidence not yet in YieldStats' snapshot
+        self.live_new_posts = 0
+        self.empty_streak = 0 # Live pages in a row without new posts
+        self.closed = False
+        self.close_reason = None
+        self._yield_stats = yield_stats
+
+    def request_sent(self):
+        """A live request for this template is going out."""
+        self.pages += 1
+        self.requests_sent += 1
+
+    def page_done(self, block_count, new_posts, results_per_page, live=True):
+        """Account one parsed page and apply the stopping rules.
+
+        Only live pages record their yield and count towards the
+        no-new-posts rule; cached pages only end paging when short.
+        """
+        self.new_posts += new_posts
+        if live:
+            self.live_pages += 1
+            self.live_new_posts += new_posts
+            if self._yield_stats is not None:
+                self._yield_stats.record(self.target, self.template, 1, new_posts)
+        self._apply_rules(block_count, new_posts, results_per_page, live)
+
+    def resume_page(self, outcome, results_per_page):
+        """Account a page the interrupted run finished (its checkpoint `outcome`).
+
+        Counts against the budget and applies the stop rules as it did then;
+        its yield is already in YieldStats.
+        """
+        if outcome is None: # Checkpoint written before outcomes were recorded
+            self.pages += 1
+            return
+        if outcome.get("live"):
+            self.pages += 1
+        self.new_posts += outcome["new"]
+        self._apply_rules(outcome["blocks"], outcome["new"], results_per_page, outcome.get("live"))
+
+    def _apply_rules(self, block_count, new_posts, results_per_page, live):
+        if block_count < results_per_page:
+            self.close("short page")
+        elif live:
+            self.empty_streak = 0 if new_posts else self.empty_streak + 1
+            if self.empty_streak >= self.empty_page_limit:
+                self.close("no new posts")
+
+    def close(self, reason):
+        if not self.closed:
+            self.closed, self.close_reason = True, reason
+
+
+class QueryPlanner:
+    """Picks which template of one target gets the next page of its budget."""
+
+    def __init__(self, target, templates, budget, max_pages, yield_stats=None, empty_page_limit=1):
+        self.target = target
+        self.templates = list(templates)
+        self.budget = budget
+        self.max_pages = max_pages
+        self.progress = {t: QueryProgress(target, t, yield_stats, empty_page_limit, max_pages) for t in self.templates}
+        # Snapshot: the live counts are added from `progress`, not re-read
+        self._history = yield_stats.target_totals(target) if yield_stats is not None else {}
+        self._priors = {}
+        for template, (pages, new_posts) in (yield_stats.template_totals() if yield_stats is not None else {}).items():
+            if pages:
+                self._priors[template] = new_posts / pages
+
+    def resume(self, query_for, is_done, outcome, results_per_page):
+        """Replay each template's pages an interrupted run finished; return how many.
+
+        `query_for(template)` is the template's query, `is_done(query, page)`
+        and `outcome(query, page)` read the checkpoint.
+        """
+        resumed = 0
+        for template in self.templates:
+            progress = self.progress[template]
+            query = query_for(template)
+            while not progress.closed and progress.next_page < self.max_pages and is_done(query, progress.next_page):
+                progress.resume_page(outcome(query, progress.next_page), results_per_page)
+                progress.next_page += 1
+                resumed += 1
+        return resumed
+
+    @property
+    def used(self):
+        return sum(p.pages for p in self.progress.values())
+
+    def expected_yield(self, template):
+        pages, new_posts = self._history.get(template, (0, 0))
+        progress = self.progress[template]
+        prior = self._priors.get(template, DEFAULT_PRIOR_YIELD)
+        return ((new_posts + progress.live_new_posts + PRIOR_WEIGHT * prior)
+                / (pages + progress.live_pages + PRIOR_WEIGHT))
+
+    def next_template(self):
+        """Open template with the best expected yield, None once the budget is spent or all are closed."""
+        if self.used >= self.budget:
+            return None
+        open_templates = [t for t in self.templates
+                          if not self.progress[t].closed and self.progress[t].next_page < self.max_pages]
+        if not open_templates:
+            return None
+        # Ties go to the earlier template in the configured order
+        return max(open_templates, key=lambda t: (self.expected_yield(t), -self.templates.index(t)))
+
+    def summary(self):
+        """One line per template: pages used, new posts, why it stopped."""
+        lines = []
+        for template in self.templates:
+            p = self.progress[template]
+            reason = p.close_reason or ("page cap" if p.next_page >= self.max_pages else "budget spent")
+            lines.append(f"{template}: {p.pages} pages, {p.new_posts} new posts, "
+                         f"yield {self.expected_yield(template):.2f}/page ({reason if p.next_page or p.closed else 'not run'})")
+        return lines
@@ -0,0 +1,52 @@
+import random
+import threading
+import time
+import urllib.parse
+
+# ==============================================================================
+# == Shared per-host request scheduler ==
+# ==============================================================================
+# One scheduler is shared by every worker in a batch run. Each live request
+# reserves the next free slot for its host, and consecutive slots for the same
+# host are spaced by a random interval. The total request rate to a host stays
+# within budget no matter how many targets run at once. A worker waiting for
+# its slot blocks only itself, so other workers keep parsing and saving.
+
+
+def host_of(url):
+    """Scheduling key for a URL (scheme + host[:port])."""
+    parts = urllib.parse.urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+class HostRateScheduler:
+    """Hands out request slots per host, spaced by uniform(min, max) seconds."""
+
+    def __init__(self, min_interval, max_interval):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self._next_slot = {} # host -> earliest time the next request may start
+        self._lock = threading.Lock()
+
+    def reserve(self, url):
+        """Reserve the next slot for url's host and return its start time."""
+        host = host_of(url)
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + random.uniform(self.min_interval, self.max_interval)
+        return slot
+
+    def wait(self, url, cancel_event=None):
+        """Block until this caller's slot for url's host; return seconds waited.
+
+        If `cancel_event` (a threading.Event) is set meanwhile, return early;
+        callers must check it before sending the request.
+        """
+        delay = self.reserve(url) - time.monotonic()
+        if delay > 0:
+            if cancel_event is not None:
+                cancel_event.wait(delay)
+            else:
+                time.sleep(delay)
+        return max(delay, 0.0)
@@ -0,0 +1,155 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import urllib.parse
+
+# ==============================================================================
+# == On-disk response cache ==
+# ==============================================================================
+# Stores fetched result pages keyed by request URL + params, so a re-run (e.g.
+# after fixing a selector) can re-parse a whole campaign without re-fetching.
+#
+# One file per request: <dir>/<key[:2]>/<key>.gz, a gzip stream holding a JSON
+# metadata line followed by the raw body bytes. The file mtime is the LRU
+# clock: it is bumped on every hit and the oldest files are evicted first once
+# the total size goes over the cap.
+
+CACHE_FILE_SUFFIX = ".gz"
+
+
+def cache_key(url, params=None):
+    """Stable hash of a request URL and its (order-independent) params."""
+    query = urllib.parse.urlencode(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+    return hashlib.sha256(f"{url}?{query}".encode("utf-8")).hexdigest()
+
+
+class CachedResponse:
+    """The parts of a requests.Response the scraper uses, rebuilt from cache."""
+
+    from_cache = True
+
+    def __init__(self, url, status_code, content, encoding, fetched_at):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.encoding = encoding # Charset the server declared, None = let the parser detect it
+        self.fetched_at = fetched_at
+
+    def raise_for_status(self):
+        pass # Only successful responses are ever cached
+
+
+class ResponseCache:
+    """Persistent request -> response cache with a TTL and an LRU size cap."""
+
+    def __init__(self, cache_dir, ttl_seconds=None, max_bytes=None):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds # None = never expires
+        self.max_bytes = max_bytes # None = unbounded
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, _, size in self._entries())
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + CACHE_FILE_SUFFIX)
+
+    def _entries(self):
+        """Yield (mtime, path, size) for every cached file."""
+        for sub in os.scandir(self.cache_dir):
+            if not sub.is_dir():
+                continue
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(CACHE_FILE_SUFFIX):
+                    st = entry.stat()
+                    yield st.st_mtime, entry.path, st.st_size
+
+    def get(self, url, params=None, ignore_ttl=False):
+        """Return a CachedResponse, or None on a miss / expired entry."""
+        path = self._path(cache_key(url, params))
+        try:
+            with gzip.open(path, "rb") as f:
+                meta = json.loads(f.readline())
+                content = f.read()
+        except FileNotFoundError:
+            self._count(hit=False)
+            return None
+        except (OSError, EOFError, ValueError) as e:
+            logging.warning(f"Dropping unreadable cache entry {path}: {e}")
+            self._remove(path)
+            self._count(hit=False)
+            return None
+
+        if not ignore_ttl and self.ttl_seconds is not None and time.time() - meta["fetched_at"] > self.ttl_seconds:
+            self._count(hit=False)
+            return None
+
+        try:
+            os.utime(path) # Mark as recently used
+        except OSError:
+            pass
+        self._count(hit=True)
+        return CachedResponse(meta["url"], meta["status"], content, meta.get("encoding"), meta["fetched_at"])
+
+    def _count(self, hit):
+        with self._lock: # Shared by batch-mode worker threads
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def put(self, url, params, response, content=None, encoding=None):
+        """Store a successful response (anything with url/status_code/content).
+
+        Pass the body as `content` if the response was streamed (its .content
+        is gone once iter_content() has consumed it). `encoding` is the
+        charset the server declared, None if it didn't: the parser then
+        detects it from the page (e.g. a <meta charset>) on replay too.
+        """
+        path = self._path(cache_key(url, params))
+        meta = {
+            "url": response.url,
+            "status": response.status_code,
+            "encoding": encoding,
+            "fetched_at": time.time(),
+        }
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, "wb") as f:
+            f.write(json.dumps(meta).encode("utf-8") + b"\n")
+            f.write(response.content if content is None else content)
+        with self._lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path) # Atomic, a crash never leaves a half-written entry
+            self._total_bytes += os.path.getsize(path) - old_size
+            if self.max_bytes is not None and self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self._total_bytes -= size
+
+    def _evict(self):
+        """Drop least recently used entries until under max_bytes (lock held)."""
+        evicted = 0
+        for _, path, size in sorted(self._entries()):
+            if self._total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._total_bytes -= size
+            evicted += 1
+        if evicted:
+            logging.info(f"Response cache over {self.max_bytes} bytes, evicted {evicted} entries")
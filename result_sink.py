@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+import threading
+import time
+
+# ==============================================================================
+# == Crash-safe result output ==
+# ==============================================================================
+# JsonlSink appends hits to a JSON Lines file as they are found (buffered,
+# flushed every N records / T seconds), so a crash or Ctrl-C loses at most the
+# last few seconds of hits. The caller clear()s it once the hits are saved
+# elsewhere; until then the file is never truncated. Checkpoint records which (target, query, page)
+# units are finished so a restarted run can skip them.
+#
+# Ordering guarantee: a unit is written to the checkpoint file only after the
+# sink holding its hits has been flushed, so "done" never refers to hits
+# that were still sitting in a buffer.
+#
+# A unit can carry a small outcome dict (e.g. how many new hits the page had)
+# so a resumed run can account for pages it skips.
+#
+# The checkpoint file starts with a {"started_at": ...} header naming the run
+# that created it. A checkpoint untouched for longer than max_age belongs to
+# an old run (e.g. yesterday's scheduled run that hit a block) and is
+# discarded instead of resumed.
+
+
+def iter_jsonl(path):
+    """Yield the records of a JSONL file, skipping a torn last line."""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logging.warning(f"Skipping unreadable line {line_no} in {path} (interrupted write?)")
+
+
+def _fsync_append(path, lines):
+    with open(path, "a", encoding="utf-8") as f:
+        f.writelines(lines)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class JsonlSink:
+    """Thread-safe, buffered, append-only JSONL writer."""
+
+    def __init__(self, path, flush_every=100, flush_interval=5.0):
+        self.path = path
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.written = 0
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._buffer.append(line)
+            self.written += 1
+            due = len(self._buffer) >= self.flush_every or time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+            if lines:
+                _fsync_append(self.path, lines)
+
+    def clear(self):
+        """Drop everything written so far, buffered or on disk."""
+        with self._lock:
+            self._buffer = []
+            open(self.path, "w", encoding="utf-8").close()
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Checkpoint:
+    """Durable set of finished (target, query, page) units, stored as JSONL."""
+
+    def __init__(self, path, flush_interval=5.0, max_age=None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.started_at = None # Start of the run the units belong to
+        self.discarded_stale = False # An old run's checkpoint was found and dropped
+        self._done = {} # unit -> outcome (None if none was recorded)
+        for record in iter_jsonl(path):
+            if isinstance(record, dict):
+                self.started_at = record.get("started_at")
+            else:
+                self._done[tuple(record[:3])] = record[3] if len(record) > 3 else None
+        if self._done and max_age is not None and time.time() - os.path.getmtime(path) > max_age:
+            logging.warning(f"Discarding stale checkpoint {path} (last written over {max_age} seconds ago)")
+            self._done.clear()
+            os.remove(path)
+            self.discarded_stale = True
+        if not self._done:
+            self.started_at = None
+        self._pending = [] # (unit, sinks) marked done but not yet on disk
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._done)
+
+    def is_done(self, target, query, page):
+        return (target, query, page) in self._done
+
+    def outcome(self, target, query, page):
+        """Outcome recorded with a finished unit, None if none was."""
+        return self._done.get((target, query, page))
+
+    def has_progress(self, target):
+        """True if any unit of `target` is already done."""
+        return any(unit[0] == target for unit in self._done)
+
+    def mark_done(self, target, query, page, sinks=(), outcome=None):
+        """Record a finished unit; `sinks` hold its hits and are flushed first."""
+        unit = (target, query, page)
+        with self._lock:
+            self._done[unit] = outcome
+            self._pending.append((unit, tuple(sinks)))
+            due = time.monotonic() - self._last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._last_flush = time.monotonic()
+            if not pending:
+                return
+            for sink in {id(s): s for _, sinks in pending for s in sinks}.values():
+                sink.flush()
+            lines = []
+            for unit, _ in pending:
+                outcome = self._done.get(unit)
+                record = [*unit, outcome] if outcome is not None else list(unit)
+                lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+            if self.started_at is None: # First write of this run's checkpoint
+                self.started_at = time.time()
+                lines.insert(0, json.dumps({"started_at": self.started_at}) + "\n")
+            _fsync_append(self.path, lines)
+
+    def clear(self):
+        """Forget all progress (campaign finished or --fresh)."""
+        with self._lock:
+            self._done.clear()
+            self._pending = []
+            self.started_at = None
+            if os.path.exists(self.path):
+                os.remove(self.path)
@@ -0,0 +1,158 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from post_store import PostRecord, post_key
+
+# ==============================================================================
+# == Persistent seen-post index ==
+# ==============================================================================
+# SQLite table of every post ever reported per target, keyed by shortcode
+# (see post_store.py), with first/last seen times. Recurring runs use it to
+# report only new posts, whichever URL variant Google shows them under, and
+# to stop paging a query once its pages contain nothing but known posts.
+# Each row also keeps the post's merged record (title, snippets, URLs,
+# queries, targets as JSON), so a known post seen again by another query in
+# a later run still gets that query and snippet merged in, just not reported.
+#
+# A post only goes in with record(), once it is in a saved output file: a
+# post found by a run that never got to save its output (crash, Ctrl-C,
+# failed write) is still new to the next run. merge_sightings() only
+# touches posts already in the index.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen_posts (
+    target     TEXT NOT NULL,
+    post_key   TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen  REAL NOT NULL,
+    record     TEXT, -- PostRecord.to_dict() JSON, NULL for posts recorded before it was kept
+    PRIMARY KEY (target, post_key)
+) WITHOUT ROWID
+"""
+
+
+class SeenIndex:
+    """Thread-safe (target, post key) -> first/last seen store."""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL") # Readers don't block the writer, survives crashes
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+        self._add_record_column()
+        self._migrate_links()
+        self._lock = threading.Lock()
+
+    def _add_record_column(self):
+        """Indexes created before records were kept only have the seen times."""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(seen_posts)")}
+        if "record" not in columns:
+            with self._conn:
+                self._conn.execute("ALTER TABLE seen_posts ADD COLUMN record TEXT")
+
+    def _migrate_links(self):
+        """Fold the old per-link table (raw URLs) into seen_posts."""
+        if not self._conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'seen_links'").fetchone():
+            return
+        rows = self._conn.execute("SELECT target, link, first_seen, last_seen FROM seen_links").fetchall()
+        with self._conn: # One transaction, a crash leaves the old table in place
+            self._conn.executemany(
+                "INSERT INTO seen_posts (target, post_key, first_seen, last_seen) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(target, post_key) DO UPDATE SET "
+                "first_seen = MIN(first_seen, excluded.first_seen), last_seen = MAX(last_seen, excluded.last_seen)",
+                [(target, key, first, last) for target, link, first, last in rows
+                 if (key := post_key(link)) is not None],
+            )
+            self._conn.execute("DROP TABLE seen_links")
+        logging.info(f"Migrated {len(rows)} seen links in {self.path} to post keys")
+
+    def known(self, target, keys):
+        """Return the subset of post `keys` already recorded for `target`."""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return set()
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT post_key FROM seen_posts WHERE target = ? AND post_key IN ({placeholders})",
+                [target, *keys],
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def record(self, target, records):
+        """Record reported posts (PostRecords) for `target`.
+
+        New posts are inserted; known ones get last_seen bumped and the
+        record merged into the stored one.
+        """
+        records = list(records)
+        if not records:
+            return
+        now = time.time()
+        with self._lock, self._conn: # Commits on success, the read-merge-write is one transaction
+            stored = self._records(target, [record.key for record in records])
+            rows = []
+            for record in records:
+                merged = stored.get(record.key)
+                if merged is not None:
+                    merged.merge_record(record)
+                rows.append((target, record.key, now, now, self._dump(merged or record)))
+            self._conn.executemany(
+                "INSERT INTO seen_posts (target, post_key, first_seen, last_seen, record) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(target, post_key) DO UPDATE SET last_seen = excluded.last_seen, record = excluded.record",
+                rows,
+            )
+
+    def merge_sightings(self, target, results, query=None):
+        """Merge parsed results (dicts with key/link/title/snippet/targets) into the posts already known.
+
+        Known posts get last_seen bumped and the sighting (query, snippet,
+        URL, targets) merged into their record; unknown ones are ignored.
+        """
+        sightings = {}
+        for result in results:
+            sightings.setdefault(result['key'], []).append(result)
+        if not sightings:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            stored = self._records(target, list(sightings))
+            rows = []
+            for key, record in stored.items():
+                found = sightings[key]
+                record = record or PostRecord(key, found[0]['title'])
+                for result in found:
+                    record.merge(result['link'], result['snippet'], query, result.get('targets', ()))
+                rows.append((now, self._dump(record), target, key))
+            self._conn.executemany(
+                "UPDATE seen_posts SET last_seen = ?, record = ? WHERE target = ? AND post_key = ?", rows
+            )
+
+    @staticmethod
+    def _dump(record):
+        return json.dumps(record.to_dict(), ensure_ascii=False)
+
+    def _records(self, target, keys):
+        """post key -> stored PostRecord (None if none was kept) of the known posts among `keys` (call under the lock)."""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        rows = self._conn.execute(
+            f"SELECT post_key, record FROM seen_posts WHERE target = ? AND post_key IN ({placeholders})",
+            [target, *keys],
+        ).fetchall()
+        return {key: PostRecord.from_dict(key, json.loads(record)) if record else None for key, record in rows}
+
+    def count(self, target):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM seen_posts WHERE target = ?", (target,)).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,322 @@
+from bs4 import BeautifulSoup
+from bs4.dammit import EncodingDetector
+import codecs
+import contextlib
+import re
+
+from post_store import post_key
+from username_matcher import UsernameMatcher
+
+try:
+    from lxml import etree
+    import lxml.html
+except ImportError: # lxml is optional, html.parser is always available
+    etree = None
+
+# ==============================================================================
+# == Result page parsing ==
+# ==============================================================================
+# Pure HTML -> results logic, kept separate from the network code in main.py
+# so it can be benchmarked and re-run against saved pages.
+#
+# Two interchangeable backends produce the same (link, title, snippet) tuples:
+#   "lxml"        - lxml tree + precompiled XPath selectors (fast, needs lxml)
+#   "html.parser" - BeautifulSoup with the stdlib parser (slow fallback)
+# Each is a (parse, iter_blocks) pair: parse(html) builds the tree and
+# iter_blocks(tree) yields one tuple (or None) per result block.
+# Keep the selectors of both backends in sync when Google changes its HTML.
+#
+# Live responses go through PageReader instead of parse(html): body chunks are
+# fed to it as they arrive, scanned for block markers as bytes and (lxml)
+# parsed incrementally, so the page is never decoded or lowercased as a whole.
+
+SNIPPET_MAX_CHARS = 250  # Store slightly longer snippet
+DEFAULT_BACKEND = "lxml" if etree is not None else "html.parser"
+
+# --- Precompiled selectors (html.parser backend) ---
+TITLE_CLASS_RE = re.compile(r'LC20lb') # Example class, UPDATE!
+TITLE_FALLBACK_CLASS_RE = re.compile(r'title-class') # UPDATE!
+SNIPPET_CLASS_RE = re.compile(r'VwiC3b|IsZvec') # Example classes, UPDATE!
+
+# Bytes of an undeclared body looked at to guess its charset (covers a <meta charset>)
+SNIFF_BYTES = 2048
+
+# Google's CAPTCHA / "unusual traffic" pages link to these paths
+BLOCK_MARKERS_RE = re.compile(rb"/recaptcha/|/sorry/", re.IGNORECASE)
+_BLOCK_MARKER_OVERLAP = len(b"/recaptcha/") - 1 # Bytes kept so a marker split across chunks is still found
+
+
+def find_result_blocks(soup):
+    """Return the result containers on a parsed result page (may be empty)."""
+    # --- SELECTOR UPDATE AREA ---
+    # YOU MUST UPDATE THESE SELECTORS BASED ON CURRENT GOOGLE HTML
+    # Use browser dev tools (F12 -> Inspect) on Google Search results
+    # Common patterns observed late 2023 / early 2024 (WILL CHANGE):
+    result_blocks = soup.find_all('div', class_='MjjYud') # Often contains organic results
+    if not result_blocks:
+         result_blocks = soup.find_all('div', class_='kvH3mc') # Another potential container
+    # Add more attempts based on inspection...
+    # Example: result_blocks = soup.find_all('div', {'jscontroller': True, 'data-cid': True})
+
+    # --- END SELECTOR UPDATE AREA ---
+    return result_blocks
+
+
+def extract_block(block):
+    """Pull (link, title_text, snippet_text) out of one result block.
+
+    Returns None when the block has no usable http(s) link.
+    """
+    # --- SELECTOR UPDATE AREA (Link, Title, Snippet) ---
+    link_tag = block.find('a', href=True)
+    title_tag = None
+    snippet_element = None
+
+    if link_tag:
+         # Title is often within an h3 inside the link
+         title_tag = link_tag.find('h3', class_=TITLE_CLASS_RE)
+         if not title_tag: # Fallback: maybe title is elsewhere?
+              title_tag = block.find('h3', class_=TITLE_FALLBACK_CLASS_RE)
+
+    # Snippet location varies greatly. Look for divs/spans containing the text description.
+    # Often requires inspecting multiple potential classes.
+    snippet_container = block.find('div', class_=SNIPPET_CLASS_RE)
+    if snippet_container:
+        # Sometimes snippet text is directly within, sometimes nested spans
+        snippet_element = snippet_container.find('span') # Or might be snippet_container itself
+        if not snippet_element:
+             snippet_element = snippet_container # Use the container if no span inside
+
+    # --- END SELECTOR UPDATE AREA ---
+
+    if not (link_tag and link_tag['href'].startswith('http')):
+        return None
+    link = link_tag['href']
+    # Separator keeps "by <b>name</b> on" apart for the word-boundary username match
+    title_text = title_tag.get_text(separator=" ", strip=True) if title_tag else "No Title Found"
+    snippet_text = snippet_element.get_text(separator=" ", strip=True) if snippet_element else "No Snippet Found"
+    return link, title_text, snippet_text
+
+
+def parse_html_parser(html):
+    """html.parser backend: build the BeautifulSoup tree."""
+    return BeautifulSoup(html, 'html.parser')
+
+
+def iter_blocks_html_parser(soup):
+    """html.parser backend: yield extract_block() output for every result block."""
+    for block in find_result_blocks(soup):
+        yield extract_block(block)
+
+
+# --- Precompiled selectors (lxml backend) ---
+# Same selectors as find_result_blocks()/extract_block(), expressed as XPath.
+if etree is not None:
+    def _has_class(name):
+        return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+    _XP_BLOCKS = [ # Tried in order, first non-empty list wins
+        etree.XPath(f"//div[{_has_class('MjjYud')}]"),
+        etree.XPath(f"//div[{_has_class('kvH3mc')}]"),
+    ]
+    _XP_LINK = etree.XPath("(.//a[@href])[1]")
+    _XP_TITLE = etree.XPath("(.//h3[contains(@class, 'LC20lb')])[1]")
+    _XP_TITLE_FALLBACK = etree.XPath("(.//h3[contains(@class, 'title-class')])[1]")
+    _XP_SNIPPET = etree.XPath("(.//div[contains(@class, 'VwiC3b') or contains(@class, 'IsZvec')])[1]")
+    _XP_SPAN = etree.XPath("(.//span)[1]")
+    # Text nodes as BeautifulSoup's get_text() sees them (no script/style, no comments)
+    _XP_TEXT = etree.XPath(".//text()[not(ancestor::script or ancestor::style)]", smart_strings=False)
+    _UTF8_PARSER = lxml.html.HTMLParser(encoding="utf-8")
+
+
+def _lxml_text(element, separator=""):
+    """lxml equivalent of Tag.get_text(separator=..., strip=True)."""
+    return separator.join(s for s in (t.strip() for t in _XP_TEXT(element)) if s)
+
+
+def parse_lxml(html):
+    """lxml backend: build the tree (None for an empty document)."""
+    try:
+        return lxml.html.document_fromstring(html)
+    except etree.ParserError: # Empty document
+        return None
+    except ValueError: # str input with an XML encoding declaration
+        return lxml.html.document_fromstring(html.encode("utf-8"), parser=_UTF8_PARSER)
+
+
+def iter_blocks_lxml(root):
+    """lxml backend: yield (link, title, snippet) or None for every result block."""
+    if root is None:
+        return
+    result_blocks = []
+    for xp_blocks in _XP_BLOCKS:
+        result_blocks = xp_blocks(root)
+        if result_blocks:
+            break
+
+    for block in result_blocks:
+        links = _XP_LINK(block)
+        if not links or not links[0].get('href').startswith('http'):
+            yield None
+            continue
+        link_tag = links[0]
+        title_tag = _XP_TITLE(link_tag) or _XP_TITLE_FALLBACK(block)
+        snippet_element = _XP_SNIPPET(block)
+        if snippet_element:
+            snippet_element = _XP_SPAN(snippet_element[0]) or snippet_element
+
+        title_text = _lxml_text(title_tag[0], " ") if title_tag else "No Title Found"
+        snippet_text = _lxml_text(snippet_element[0], " ") if snippet_element else "No Snippet Found"
+        yield link_tag.get('href'), title_text, snippet_text
+
+
+PARSER_BACKENDS = {"html.parser": (parse_html_parser, iter_blocks_html_parser)}
+if etree is not None:
+    PARSER_BACKENDS["lxml"] = (parse_lxml, iter_blocks_lxml)
+
+
+def extract_results(html, matcher, backend=None, metrics=None):
+    """Parse a result page and return (block_count, results).
+
+    results is a list of dicts {title, link, snippet, targets, key} for
+    Instagram post links whose title or snippet mentions at least one of the
+    watched usernames, in page order and one per post. `key` is the post's
+    shortcode (post_store.post_key) and `targets` lists every watched
+    username mentioned. block_count == 0 means the selectors
+    matched nothing, which usually means Google changed its HTML.
+    `matcher` is a UsernameMatcher (or a single username string).
+    `backend` is a PARSER_BACKENDS key, DEFAULT_BACKEND if not given.
+    With a metrics.Metrics, the "parse" and "extract" stages are timed.
+    """
+    parse, iter_blocks = PARSER_BACKENDS[backend or DEFAULT_BACKEND]
+    if isinstance(matcher, str):
+        matcher = UsernameMatcher([matcher])
+    timer = metrics.timer if metrics is not None else lambda stage: contextlib.nullcontext()
+
+    with timer("parse"):
+        tree = parse(html)
+    with timer("extract"):
+        return _extract_from_tree(tree, iter_blocks, matcher)
+
+
+def sniff_encoding(head):
+    """Charset for a body that came without one, from its first bytes.
+
+    A BOM or <meta charset> wins; otherwise UTF-8 if the bytes decode as
+    UTF-8 (like BeautifulSoup's detection), else None. lxml's feed parser
+    would fall back to Latin-1 and garble UTF-8 pages with no declaration.
+    """
+    declared = EncodingDetector.strip_byte_order_mark(head)[1] or \
+        EncodingDetector.find_declared_encoding(head, is_html=True)
+    if declared:
+        return declared
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False) # May end mid-character
+    except UnicodeDecodeError:
+        return None
+    return "utf-8"
+
+
+class PageReader:
+    """Incremental reader of one result page body (bytes, chunk by chunk).
+
+    feed() every chunk, then read_results(). `encoding` is the charset the
+    server declared, if any; otherwise the parser detects it (BOM, meta
+    tag, else UTF-8 if the first chunk is valid UTF-8; see sniff_encoding).
+    """
+
+    def __init__(self, backend=None, encoding=None):
+        self.backend = backend or DEFAULT_BACKEND
+        self.encoding = encoding
+        self.blocked = False # A block marker was seen in the body
+        self._chunks = []
+        self._content = None
+        self._tail = b""
+        # Only lxml can build its tree while the body is still downloading;
+        # without a declared charset it is created once SNIFF_BYTES are in
+        self._parser = None
+        self._unparsed = 0 # Bytes held back until the parser exists
+        if self.backend == "lxml" and encoding is not None:
+            self._parser = lxml.html.HTMLParser(encoding=encoding)
+
+    def feed(self, chunk):
+        if not chunk:
+            return
+        self._chunks.append(chunk)
+        self._content = None
+        if not self.blocked:
+            window = self._tail + chunk
+            self.blocked = BLOCK_MARKERS_RE.search(window) is not None
+            self._tail = window[-_BLOCK_MARKER_OVERLAP:]
+        if self._parser is not None:
+            self._parser.feed(chunk)
+        elif self.backend == "lxml":
+            self._unparsed += len(chunk)
+            if self._unparsed >= SNIFF_BYTES:
+                self._start_parser()
+
+    def _start_parser(self):
+        head = self.content
+        self._parser = lxml.html.HTMLParser(encoding=sniff_encoding(head[:SNIFF_BYTES]))
+        self._parser.feed(head)
+
+    @property
+    def content(self):
+        """The whole body as bytes (for the cache and debug artifacts)."""
+        if self._content is None:
+            self._content = b"".join(self._chunks)
+            self._chunks = [self._content]
+        return self._content
+
+    def close(self):
+        """Finish parsing and return the backend's tree (None if empty, lxml)."""
+        if self.backend != "lxml":
+            return BeautifulSoup(self.content, 'html.parser', from_encoding=self.encoding)
+        if self._parser is None:
+            if not self._unparsed: # Nothing was fed
+                return None
+            self._start_parser() # Short body
+        try:
+            return self._parser.close()
+        except (etree.XMLSyntaxError, etree.ParserError): # Empty document
+            return None
+
+    def read_results(self, matcher, metrics=None):
+        """extract_results() for the fed body: returns (block_count, results)."""
+        iter_blocks = PARSER_BACKENDS[self.backend][1]
+        if isinstance(matcher, str):
+            matcher = UsernameMatcher([matcher])
+        timer = metrics.timer if metrics is not None else lambda stage: contextlib.nullcontext()
+
+        with timer("parse"):
+            tree = self.close()
+        with timer("extract"):
+            return _extract_from_tree(tree, iter_blocks, matcher)
+
+
+def _extract_from_tree(tree, iter_blocks, matcher):
+    results = []
+    page_keys = set()
+    block_count = 0
+    for extracted in iter_blocks(tree):
+        block_count += 1
+        if extracted is None:
+            continue
+        link, title_text, snippet_text = extracted
+
+        key = post_key(link) # Any URL variant of an Instagram post, see post_store.py
+        if key is None or key in page_keys:
+            continue
+        mentioned = matcher.find(title_text + " " + snippet_text)
+
+        if mentioned:
+            results.append({
+                'title': title_text,
+                'link': link,
+                'key': key,
+                'snippet': snippet_text[:SNIPPET_MAX_CHARS],
+                'targets': mentioned
+            })
+            page_keys.add(key)
+
+    return block_count, results
@@ -0,0 +1,91 @@
+from collections import deque
+
+# ==============================================================================
+# == Multi-username matcher ==
+# ==============================================================================
+# Aho-Corasick automaton over every watched username, built once per run.
+# One pass over a result's text finds every watched name it mentions, however
+# many names there are, instead of one substring scan per name.
+#
+# Matches must stand alone as a username: "pat" matches "@pat", "pat's" or
+# "by pat." but not "patty" or "leanbeefpatty".
+
+# Characters an Instagram username is made of. '.' only counts when it sits
+# between two of the others ("lean.beef"), so a sentence-final "pat." matches.
+USERNAME_CHARS = frozenset("abcdefghijklmnopqrstuvwxyz0123456789_")
+
+
+def _is_boundary_before(text, start):
+    if start == 0:
+        return True
+    prev = text[start - 1]
+    if prev == "." and start >= 2:
+        return text[start - 2] not in USERNAME_CHARS
+    return prev not in USERNAME_CHARS
+
+
+def _is_boundary_after(text, end):
+    if end >= len(text):
+        return True
+    nxt = text[end]
+    if nxt == "." and end + 1 < len(text):
+        return text[end + 1] not in USERNAME_CHARS
+    return nxt not in USERNAME_CHARS
+
+
+class UsernameMatcher:
+    """Finds which of a fixed set of usernames a text mentions (case-insensitive)."""
+
+    def __init__(self, usernames):
+        self.usernames = list(dict.fromkeys(usernames))
+        # Automaton as parallel lists indexed by state; state 0 is the root
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()] # (username, length) pairs ending in this state
+        for username in self.usernames:
+            self._add(username)
+        self._build_failure_links()
+
+    def __len__(self):
+        return len(self.usernames)
+
+    def _add(self, username):
+        state = 0
+        for ch in username.lower():
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] += ((username, len(username)),)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def find(self, text):
+        """Return the watched usernames mentioned in `text`, in first-seen order."""
+        text = text.lower()
+        goto, fail, out = self._goto, self._fail, self._out
+        found = {}
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for username, length in out[state]:
+                end = i + 1
+                if username not in found and _is_boundary_before(text, end - length) and _is_boundary_after(text, end):
+                    found[username] = None
+        return list(found)